@@ -5,9 +5,37 @@ Created on Wed Jun  7 10:57:03 2023
 @author: Xingyi Li
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from array import array
+import asyncio
 from datetime import datetime, timedelta, date
+import bisect
+import collections
+import contextlib
+import copy
+import functools
+import heapq
 import json
+import math
+import mmap
+import numpy
+import operator
+import os
 import pandas
+import re
+import sqlite3
+import threading
+import tempfile
+import types
+import time
+import weakref
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 ONE_DAY_IN_SEC = 86400
 YYYYMMDD = '%Y%m%d'
@@ -36,7 +64,16 @@ ST_MANUAL = 'M'
 ST_CYCLE_START = 'Z'
 
 NULL_DATE = datetime.strptime('19000101', YYYYMMDD).date()
+DATE_CODEC_CACHE_SIZE = 4096  # memo size of the YYYYMMDD date codecs
+MONTH_DELTA_CACHE_SIZE = 1024  # memo size of the shared MonthDeltas
+STRATEGY_MEMO_SIZE = 4096  # memo size of each shared strategy
+WORKLOAD_END_DATE = '22000101'  # dates of the workload index lie before
+DAY_COUNTER_MIN_DAYS = 64  # initial days of a workload day counter
+METRICS_ENV = 'PLAN_ALG_METRICS'  # set to 1 to collect metrics from import on
 TABLE_SCHEDULE = 'MHIS.json'
+TABLE_SCHEDULE_DB = 'MHIS.db'
+TABLE_SCHEDULE_SHARDS = 'MHIS'  # directory of the plan sharded schedule table
+FILE_LOCK_TIMEOUT = 60  # seconds to wait for the lock of a shard
 TABLE_MEASURING_DOC = 'IMRG.json'
 
 SYSTEM = None
@@ -181,12 +218,80 @@ class MonthDelta:
     def __bool__(self):
         return bool(self.__months)
     __nonzero__ = __bool__
-    
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # day 0 of datetime64[D]
+FIRST_YYYY_ORDINAL = date(1000, 1, 1).toordinal()  # first day with a 4 digit year
+
+
+# shared MonthDelta of a month count; the type is checked before the cache, where
+# a float would find the entry of the equal int
+def _month_delta(months: int) -> MonthDelta:
+    if not isinstance(months, int):
+        raise TypeError('months must be an integer')
+    return _cached_month_delta(months)
+
+
+@functools.lru_cache(maxsize=MONTH_DELTA_CACHE_SIZE)
+def _cached_month_delta(months: int) -> MonthDelta:
+    return MonthDelta(months)
+
+
+# MonthDelta addition on a datetime64[D] array, clamping to the last day of too
+# short months
+def _add_months_to_days(days, months):
+    month_start = days.astype('datetime64[M]')
+    day = (days - month_start.astype('datetime64[D]')).astype(numpy.int64)
+    target = month_start + months
+    target_start = target.astype('datetime64[D]')
+    month_len = ((target + 1).astype('datetime64[D]') - target_start).astype(numpy.int64)
+    return target_start + numpy.minimum(day, month_len - 1)
+
+
+# date(o) + MonthDelta(m) for arrays of day ordinals o and month deltas m (or
+# scalars, broadcast like numpy), as an int64 array of day ordinals
+def add_months_to_ordinals(ordinals, months):
+    days = (numpy.asarray(ordinals, dtype=numpy.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+    months = numpy.asarray(months)
+    if months.dtype.kind not in 'iu':  # as MonthDelta, no silent truncation of floats
+        raise TypeError('months must be an integer')
+    months = months.astype(numpy.int64).astype('timedelta64[M]')
+    result = _add_months_to_days(days, months).astype(numpy.int64) + EPOCH_ORDINAL
+    if result.size and (result.min() < 1 or result.max() > date.max.toordinal()):
+        raise OverflowError('date value out of range')
+    return result
+
 
 # Singleton used as deadline time reference considering call object interval involved.
-class System:
-    _instance = None
+# Current and deadline reference date of scheduling. Schedulers use the System clock
+# unless they are given their own.
+class Clock:
     _interval = 0      # call object interval
+    _today = None      # fixed current date instead of the wall clock
+
+    def __init__(self, interval=0, today: date = None):
+        self._interval = interval
+        self._today = today
+
+    def today(self) -> date:
+        if self._today is not None:
+            return self._today
+        return datetime.today().date()
+
+    # freeze the current date, e.g. for reproducible runs; None restores the wall clock
+    def set_today(self, d: date = None):
+        self._today = d
+
+    # used as reference for deadline monitoring considering call object interval involved
+    def reference_date(self) -> date:
+        return self.today() + timedelta(days=self._interval)
+
+    def set_reference_date(self, d: date):
+        self._interval = timedelta_in_days(d, self.today())
+
+
+class System(Clock):
+    _instance = None
 
     @staticmethod
     def get_instance(interval=0):
@@ -200,14 +305,30 @@ class System:
             raise Exception("Error: singleton exception")
         else:
             System._instance = self
-            self._interval = interval
+            super().__init__(interval)
 
-    # used as reference for deadline monitoring considering call object interval involved
-    def reference_date(self) -> date:
-        return datetime.today().date() + timedelta(days=self._interval)
 
-    def set_reference_date(self, d: date):
-        self._interval = timedelta_in_days(d, datetime.today().date())
+_named_locks = weakref.WeakValueDictionary()
+_named_locks_guard = threading.Lock()
+
+
+# process wide reentrant lock by kind and name, e.g. one per plan_num. A lock lives
+# as long as it is held or referenced, e.g. by the schedulers of its plan.
+def _named_lock(kind: str, name) -> threading.RLock:
+    with _named_locks_guard:
+        lock = _named_locks.get((kind, name))
+        if lock is None:
+            lock = _named_locks[(kind, name)] = threading.RLock()
+        return lock
+
+
+# runs the method under the lock of the plan of the scheduler
+def _synchronized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 def save_data_in_json(data, filename):
@@ -220,7 +341,11 @@ def read_data_in_json(filename):
     file = open(filename)
     try:
         data = json.load(file)
-    except Exception:
+    except json.JSONDecodeError:
+        # an empty file is an empty table, anything else must not be dropped silently
+        file.seek(0)
+        if file.read().strip() != '':
+            raise
         data = {}
     finally:
         file.close()
@@ -228,23 +353,156 @@ def read_data_in_json(filename):
     return data
 
 
+_JSON_WS = re.compile(rb'[ \t\n\r]*')
+_JSON_STRING_PATTERN = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_JSON_STRING = re.compile(_JSON_STRING_PATTERN, re.DOTALL)
+# unrolled "other* (string other*)*" patterns, they never backtrack catastrophically
+_JSON_OTHER_PATTERN = rb'[^"\[\]{}]*'
+_JSON_SKIP = re.compile(_JSON_OTHER_PATTERN + rb'(?:' + _JSON_STRING_PATTERN +
+                        _JSON_OTHER_PATTERN + rb')*', re.DOTALL)
+_JSON_FLAT_ARRAY_PATTERN = (rb'\[' + _JSON_OTHER_PATTERN + rb'(?:' + _JSON_STRING_PATTERN +
+                            _JSON_OTHER_PATTERN + rb')*\]')
+# a list of call rows in one match
+_JSON_ROW_ARRAY = re.compile(rb'\[' + _JSON_OTHER_PATTERN + rb'(?:(?:' + _JSON_STRING_PATTERN +
+                             rb'|' + _JSON_FLAT_ARRAY_PATTERN + rb')' +
+                             _JSON_OTHER_PATTERN + rb')*\]', re.DOTALL)
+_JSON_SCALAR = re.compile(rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|true|false|null')
+_JSON_CLOSERS = {b'[': b']', b'{': b'}'}
+
+
+def _json_error(filename, pos):
+    return ValueError(f'Error: corrupted schedule file {filename} at byte {pos}')
+
+
+def _json_skip_ws(buf, pos: int) -> int:
+    return _JSON_WS.match(buf, pos).end()
+
+
+# end position of the JSON value starting at pos, checking only its structure
+def _json_value_end(buf, pos: int, filename) -> int:
+    c = buf[pos:pos + 1]
+    if c == b'"':
+        m = _JSON_STRING.match(buf, pos)
+        if m is None:
+            raise _json_error(filename, pos)
+        return m.end()
+    elif c in _JSON_CLOSERS:
+        m = _JSON_ROW_ARRAY.match(buf, pos)
+        if m is not None:
+            return m.end()
+
+        expected = []
+        while True:
+            if len(expected) > 0:
+                pos = _JSON_SKIP.match(buf, pos).end()
+            c = buf[pos:pos + 1]
+            if c == b'':
+                raise _json_error(filename, pos)
+            elif c == b'"':  # unterminated string
+                raise _json_error(filename, pos)
+            elif c in _JSON_CLOSERS:
+                expected.append(_JSON_CLOSERS[c])
+            elif len(expected) == 0 or expected.pop() != c:
+                raise _json_error(filename, pos)
+            pos += 1
+            if len(expected) == 0:
+                return pos
+    else:
+        m = _JSON_SCALAR.match(buf, pos)
+        if m is None:
+            raise _json_error(filename, pos)
+        return m.end()
+
+
+# Streaming reader for MHIS-format files ({plan_num: [call rows]}): scans the
+# memory-mapped file and only materializes the values of the requested plan_num keys.
+def read_plans_in_json(filename, plan_nums: list) -> dict:
+    wanted = set(plan_nums)
+    result = {}
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return result
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = _json_skip_ws(buf, 0)
+            if buf[pos:pos + 1] != b'{':
+                raise _json_error(filename, pos)
+            pos = _json_skip_ws(buf, pos + 1)
+            if buf[pos:pos + 1] == b'}':
+                pos += 1
+            else:
+                while True:
+                    m = _JSON_STRING.match(buf, pos)
+                    if m is None:
+                        raise _json_error(filename, pos)
+                    key = json.loads(buf[m.start():m.end()])
+                    pos = _json_skip_ws(buf, m.end())
+                    if buf[pos:pos + 1] != b':':
+                        raise _json_error(filename, pos)
+                    pos = _json_skip_ws(buf, pos + 1)
+                    end = _json_value_end(buf, pos, filename)
+                    if key in wanted:
+                        try:
+                            result[key] = json.loads(buf[pos:end])
+                        except ValueError:
+                            raise _json_error(filename, pos)
+                    pos = _json_skip_ws(buf, end)
+                    c = buf[pos:pos + 1]
+                    if c == b',':
+                        pos = _json_skip_ws(buf, pos + 1)
+                    elif c == b'}':
+                        pos += 1
+                        break
+                    else:
+                        raise _json_error(filename, pos)
+
+            if _json_skip_ws(buf, pos) != len(buf):
+                raise _json_error(filename, pos)
+
+    return result
+
+
+# The YYYYMMDD codecs slice the fixed format directly and memoize frequent dates,
+# anything else goes through strptime/strftime as before.
+@functools.lru_cache(maxsize=DATE_CODEC_CACHE_SIZE)
+def _format_date(d: date) -> str:
+    if d.year < 1000:
+        return d.strftime(YYYYMMDD)
+    return '%04d%02d%02d' % (d.year, d.month, d.day)
+
+
+@functools.lru_cache(maxsize=DATE_CODEC_CACHE_SIZE)
+def _parse_date(s: str) -> date:
+    if len(s) == 8 and s.isascii() and s.isdigit():
+        return date(int(s[0:4]), int(s[4:6]), int(s[6:8]))
+    return datetime.strptime(s, YYYYMMDD).date()
+
+
+@functools.lru_cache(maxsize=DATE_CODEC_CACHE_SIZE)
+def _parse_datetime(s: str) -> datetime:
+    if len(s) == 17 and s[8] == ' ' and s[11] == ':' and s[14] == ':' and s.isascii():
+        digits = s[0:8] + s[9:11] + s[12:14] + s[15:17]
+        if digits.isdigit():
+            return datetime(int(s[0:4]), int(s[4:6]), int(s[6:8]),
+                            int(s[9:11]), int(s[12:14]), int(s[15:17]))
+    return datetime.strptime(s, YMDHMS)
+
+
 def date2Str(d: date) -> str:
-    s = d.strftime(YYYYMMDD)
-    return s
+    return _format_date(d)
 
 
 def str2Date(s: str) -> date:
     if s is None or len(s) == 0:
-        return datetime.strptime('19000101', YYYYMMDD).date()
+        return NULL_DATE
     else:
-        return datetime.strptime(s, YYYYMMDD).date()
+        return _parse_date(s)
 
 
 def str2DateTime(s: str) -> datetime:
     if s is None or len(s) == 0:
-        return datetime.strptime('19000101 00:00:00', YMDHMS)
+        return datetime(1900, 1, 1)
     else:
-        return datetime.strptime(s, YMDHMS)
+        return _parse_datetime(s)
 
 
 def period2seconds(period: float, unit: str) -> int:
@@ -273,34 +531,123 @@ def timedelta_in_days(d1: date, d2: date) -> int:
     d = d1 - d2
     return int(d.total_seconds()/ONE_DAY_IN_SEC)
 
+# days of a month, month 0 based
+def _month_length(year: int, month: int) -> int:
+    if month == 1:
+        return 29 if not year % 4 and (year % 100 or not year % 400) else 28
+    return 30 if month in (3, 5, 8, 10) else 31
+
+
+# shortest of the months m0 + k * months for k = 1..count, months counted from
+# year 0. The month of the year repeats every 12 / gcd(months, 12) steps and the
+# leap years every 400 years, so at most 12 months and 100 Februaries are looked at.
+def _shortest_month(m0: int, months: int, count: int) -> int:
+    period = 12 // math.gcd(months, 12)
+    result = 31
+    for k in range(1, min(count, period) + 1):
+        year, month = divmod(m0 + k * months, 12)
+        if month != 1:
+            result = min(result, _month_length(year, month))
+            continue
+        years = period * months // 12  # between the Februaries on the way
+        visits = min((count - k) // period + 1, 400 // math.gcd(years, 400))
+        for j in range(visits):
+            result = min(result, _month_length(year + j * years, 1))
+            if result == 28:
+                break
+    return result
+
+
+# Compiled calendar: a workday bitmap over the ordinal span of the holidays plus a
+# prefix-sum of workdays, days outside the span are workdays.
 class FactoryCalendar:
-    _holidays = []
+    _frozen = False
 
     def __init__(self, holidays: []):
-        for s in holidays:
-            self._holidays.append(str2Date(s))
+        self._holidays = tuple(str2Date(s) for s in holidays)
+        self._compile()
+
+    # shared calendars of the SchedulingRegistry are frozen
+    def freeze(self):
+        self._workday_map = bytes(self._workday_map)
+        self._workday_prefix = tuple(self._workday_prefix)
+        self._holiday_prefix = tuple(self._holiday_prefix)
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f'Error: shared factory calendar is immutable ({name})')
+        object.__setattr__(self, name, value)
+
+    def _compile(self):
+        ordinals = sorted(set(h.toordinal() for h in self._holidays))
+        if len(ordinals) > 0:
+            self._first = ordinals[0]
+            self._last = ordinals[-1]
+        else:
+            self._first = 1
+            self._last = 0
+        self._holiday_total = len(ordinals)
 
-    def holiday_count(self, start, end):
-        cnt = 0
+        span = self._last - self._first + 1
+        self._workday_map = bytearray(b'\x01') * span
+        listed = [0] * span  # a holiday listed twice is counted twice by holiday_count()
         for h in self._holidays:
-            if h >= start and h <= end:
-                cnt += 1
-        return cnt
+            listed[h.toordinal() - self._first] += 1
+        for o in ordinals:
+            self._workday_map[o - self._first] = 0
+
+        # _workday_prefix[i]: number of workdays in [first, first + i),
+        # _holiday_prefix[i]: number of listed holidays in [first, first + i)
+        self._workday_prefix = [0] * (span + 1)
+        self._holiday_prefix = [0] * (span + 1)
+        for i in range(span):
+            self._workday_prefix[i + 1] = self._workday_prefix[i] + self._workday_map[i]
+            self._holiday_prefix[i + 1] = self._holiday_prefix[i] + listed[i]
+
+    # number of workdays in [first, o], extrapolated 1 per day outside the span
+    def _workdays_upto(self, o: int) -> int:
+        if o < self._first:
+            return o - self._first + 1
+        elif o > self._last:
+            return self._workday_prefix[-1] + o - self._last
+        else:
+            return self._workday_prefix[o - self._first + 1]
+
+    def holiday_count(self, start, end):
+        s = max(start.toordinal(), self._first)
+        e = min(end.toordinal(), self._last)
+        if e < s:
+            return 0
+        return self._holiday_prefix[e - self._first + 1] - self._holiday_prefix[s - self._first]
 
     def is_workday(self, d: datetime.date):
-        return d not in self._holidays
+        o = d.toordinal()
+        if o < self._first or o > self._last:
+            return True
+        return self._workday_map[o - self._first] == 1
 
+    # returns the (workdays + 1)th workday after d
     def add_workdays(self, d: datetime.date, workdays: int):
-        cnt = 0
-        wdc = 0
-        while wdc <= workdays:
-            cnt += 1
-            rd = d + timedelta(days=cnt)
-            if self.is_workday(rd):
-                wdc += 1
-
-        return rd
-    
+        n = math.floor(workdays) + 1
+        if n <= 0:
+            raise ValueError(f'Error: invalid number of workdays {workdays}')
+
+        o = d.toordinal()
+        target = self._workdays_upto(o) + n
+        # the answer lies within [o + n, o + n + holidays], binary search for the
+        # first day reaching the target workday count
+        lo = o + n
+        hi = o + n + self._holiday_total
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._workdays_upto(mid) >= target:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return d + timedelta(days=lo - o)
+
 
 class MaintenancePackage:
     def __init__(self, data=[]):
@@ -326,7 +673,7 @@ class MaintenancePackage:
 
 class MaintenanceStrategy:
     factory_calendar = None
-    packages = {}
+    _frozen = False
 
     def __init__(self, head_data=[], pckg_data=[]):
         self.name = head_data[0]
@@ -341,15 +688,103 @@ class MaintenanceStrategy:
         if head_data[9] == "":
             self.factory_calendar = None
         else:
-            self.factory_calendar = FactoryCalendar(HOLIDAYS)
+            self.factory_calendar = SchedulingRegistry.get_instance().calendar(head_data[9])
 
+        self.packages = {}
         for row in pckg_data:
             p = MaintenancePackage(row)
             self.packages[row[0]] = p
 
+        self._memo = {}  # results of the day by day scans by arguments
+        self._compile()
+
+    # shared strategies of the SchedulingRegistry are frozen, their memo is shared
+    # by all plans of the strategy
+    def freeze(self):
+        self.packages = types.MappingProxyType(self.packages)
+        self._table_offsets = tuple(self._table_offsets)
+        self._table_masks = tuple(self._table_masks)
+        self._table_packages = tuple(tuple(p) for p in self._table_packages)
+        self._table_texts = tuple(self._table_texts)
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f'Error: shared maintenance strategy is immutable ({name})')
+        object.__setattr__(self, name, value)
+
+    def _memoized(self, key, func):
+        result = self._memo.get(key)
+        if result is None:
+            if len(self._memo) >= STRATEGY_MEMO_SIZE:
+                self._memo.clear()
+            result = self._memo[key] = func()
+        return result
+
+    def max_cycle_in_days(self):
+        return max(p.cycle_in_days() for p in self.packages.values())
+
     def __str__(self):
         return f"{self.name}: {self.description} unit: {self.unit}"
 
+    # Compile the package cycles into a cyclic table over one hyperperiod (the LCM of
+    # the package cycles): sorted due offsets in (0, hyperperiod] and the bitmask of
+    # the packages due at each of them.
+    def _compile(self):
+        self._hyperperiod = 0
+        self._table_offsets = []
+        self._table_masks = []
+        self._table_packages = []
+        self._table_texts = []
+
+        pkgs = list(self.packages.values())
+        cycles = []
+        for p in pkgs:
+            c = p.cycle_in_days()
+            if c is None or c <= 0 or c != int(c):
+                return  # not an integral day cycle, keep scanning day by day
+            cycles.append(int(c))
+        if len(cycles) == 0:
+            return
+
+        hyperperiod = 1
+        for c in cycles:
+            hyperperiod = hyperperiod * c // math.gcd(hyperperiod, c)
+
+        masks = {}
+        for bit, c in enumerate(cycles):
+            for o in range(c, hyperperiod + 1, c):
+                masks[o] = masks.get(o, 0) | (1 << bit)
+
+        self._hyperperiod = hyperperiod
+        for o in sorted(masks):
+            mask = masks[o]
+            due = [p for bit, p in enumerate(pkgs) if mask & (1 << bit)]
+            self._table_offsets.append(o)
+            self._table_masks.append(mask)
+            self._table_packages.append([p.number for p in due])
+            self._table_texts.append(''.join(p.cycle_short_text for p in due))
+
+    # index into the compiled table of the first due offset after offset, with the
+    # number of hyperperiods to add
+    def _next_entry(self, offset: int):
+        q, r = divmod(offset, self._hyperperiod)
+        return q, bisect.bisect_right(self._table_offsets, r)
+
+    def _table_offset(self, q: int, j: int) -> int:
+        return q * self._hyperperiod + self._table_offsets[j]
+
+    def _next_due_offset(self, offset: int) -> int:
+        q, j = self._next_entry(offset)
+        return self._table_offset(q, j)
+
+    def _is_due_offset(self, offset: int) -> bool:
+        r = offset % self._hyperperiod
+        if r == 0:
+            return True
+        j = bisect.bisect_left(self._table_offsets, r)
+        return j < len(self._table_offsets) and self._table_offsets[j] == r
+
     def min_cycle_in_days(self) -> int:
         t = []
         for p in self.packages.values():
@@ -357,38 +792,70 @@ class MaintenanceStrategy:
 
         return min(t)
 
-    def max_cycle_in_days(self) -> int:
-        t = []
-        for p in self.packages.values():
-            t.append(p.cycle_in_days())
-
-        return max(t)
-
     def package_sequence(self, start_offset=0, period=360) -> list:
+        end = int(start_offset + period + 1)
+        ps = []
+        if self._hyperperiod == 0:
+            seq = self._memoized(('package_sequence', start_offset, end),
+                                 lambda: self._scan_package_sequence(start_offset, end))
+            return [(i, list(due_package)) for i, due_package in seq]
+
+        q, j = self._next_entry(start_offset)
+        while True:
+            if j == len(self._table_offsets):
+                q += 1
+                j = 0
+            i = self._table_offset(q, j)
+            if i >= end:
+                break
+            ps.append((i, list(self._table_packages[j])))
+            j += 1
+        return ps
+
+    def _scan_package_sequence(self, start_offset, end) -> tuple:
         ps = []
-        for i in range(start_offset + 1, int(start_offset + period + 1)):
+        for i in range(start_offset + 1, end):
             due_package = []
             for p in self.packages.values():
                 if i % p.cycle_in_days() == 0:
                     due_package.append(p.number)
-
             if len(due_package) > 0:
-                ps.append((i, due_package))
-        return ps
+                ps.append((i, tuple(due_package)))
+        return tuple(ps)
+
+    # the packages due at the first offset after previous_offset, if it is reached
+    # by d and lies within the 360 days window after previous_offset
+    def _due_entry_after(self, d: date, start_date: date, previous_offset=0) -> int:
+        q, j = self._next_entry(previous_offset)
+        first = self._table_offset(q, j)
+        delta = timedelta_in_days(d, start_date)
+        if first < int(previous_offset + 360 + 1) and previous_offset + delta >= first:
+            return j
+        return None
 
     def due_packages(self, d: date, start_date: date, previous_offset=0) -> list:
-        ps = self.package_sequence(previous_offset)
-        delta = timedelta_in_days(d, start_date)
-        pkg_list = []
-        for t in ps:
-            if previous_offset + delta >= t[0]:
-                for i in t[1]:
-                    pkg_list.append(self.packages[i])
-                break
+        if self._hyperperiod == 0:
+            ps = self.package_sequence(previous_offset)
+            delta = timedelta_in_days(d, start_date)
+            pkg_list = []
+            for t in ps:
+                if previous_offset + delta >= t[0]:
+                    for i in t[1]:
+                        pkg_list.append(self.packages[i])
+                    break
+
+            return pkg_list
 
-        return pkg_list
+        j = self._due_entry_after(d, start_date, previous_offset)
+        if j is None:
+            return []
+        return [self.packages[i] for i in self._table_packages[j]]
 
     def due_packages_text(self, d: date, start_date: date, previous_offset=0) -> str:
+        if self._hyperperiod > 0:
+            j = self._due_entry_after(d, start_date, previous_offset)
+            return "" if j is None else self._table_texts[j]
+
         dp = self.due_packages(d, start_date, previous_offset)
         txt = ""
         for p in dp:
@@ -398,6 +865,15 @@ class MaintenanceStrategy:
 
     # CCF doesn't play any role with offset in strategy
     def next_offset(self, start_offset=0, previous_offset=0) -> int:
+        if self._hyperperiod > 0:
+            if previous_offset > start_offset and self._is_due_offset(previous_offset):
+                return self._next_due_offset(previous_offset)
+            return self._next_due_offset(start_offset)
+
+        return self._memoized(('next_offset', start_offset, previous_offset),
+                              lambda: self._scan_next_offset(start_offset, previous_offset))
+
+    def _scan_next_offset(self, start_offset, previous_offset) -> int:
         ps = self.package_sequence(start_offset, previous_offset + self.max_cycle_in_days())
         result = ps[0][0]
         for i in range(len(ps)):
@@ -417,7 +893,184 @@ class MaintenanceStrategy:
                     return p
         else:
             return None
-    
+
+
+# Compiled factory calendars and maintenance strategies by ID, each is built once,
+# frozen and shared by all plans using it. Calendar '00' holds HOLIDAYS.
+class SchedulingRegistry:
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if SchedulingRegistry._instance is None:
+            SchedulingRegistry._instance = SchedulingRegistry()
+        return SchedulingRegistry._instance
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._calendar_sources = {'00': HOLIDAYS}
+        self._strategy_sources = {}
+        self._calendars = {}
+        self._strategies = {}
+
+    def register_calendar(self, calendar_id: str, holidays: list):
+        with self._lock:
+            self._calendar_sources[calendar_id] = list(holidays)
+            self._calendars.pop(calendar_id, None)
+
+    def has_calendar(self, calendar_id: str) -> bool:
+        return calendar_id in self._calendar_sources
+
+    def calendar(self, calendar_id: str) -> FactoryCalendar:
+        fc = self._calendars.get(calendar_id)
+        if fc is None:
+            with self._lock:
+                fc = self._calendars.get(calendar_id)
+                if fc is None:
+                    if calendar_id not in self._calendar_sources:
+                        raise ValueError(f'Error: unknown factory calendar {calendar_id}')
+                    fc = FactoryCalendar(self._calendar_sources[calendar_id])
+                    fc.freeze()
+                    self._calendars[calendar_id] = fc
+        return fc
+
+    def register_strategy(self, strategy_id: str, head_data: list, pckg_data: list):
+        with self._lock:
+            self._strategy_sources[strategy_id] = (list(head_data),
+                                                   [list(row) for row in pckg_data])
+            self._strategies.pop(strategy_id, None)
+
+    def strategy(self, strategy_id: str) -> MaintenanceStrategy:
+        ms = self._strategies.get(strategy_id)
+        if ms is None:
+            with self._lock:
+                ms = self._strategies.get(strategy_id)
+                if ms is None:
+                    if strategy_id not in self._strategy_sources:
+                        raise ValueError(f'Error: unknown maintenance strategy {strategy_id}')
+                    ms = MaintenanceStrategy(*self._strategy_sources[strategy_id])
+                    ms.freeze()
+                    self._strategies[strategy_id] = ms
+        return ms
+
+    # shared strategy of the given data, strategies with the same data are built once
+    def intern_strategy(self, head_data: list, pckg_data: list) -> MaintenanceStrategy:
+        key = json.dumps([head_data, pckg_data])
+        if key not in self._strategy_sources:
+            self.register_strategy(key, head_data, pckg_data)
+        return self.strategy(key)
+
+
+# Time-sorted measurement readings of one counter (measuring point). Readings are
+# kept in ordinal/value arrays for binary search, the usage rate per day is the
+# average between the first and the last reading and is updated on every new
+# reading; annual_estimate is used until two readings on different days exist.
+class MeasuringPoint:
+    def __init__(self, point: str, annual_estimate: float = 0):
+        self.point = point
+        self.annual_estimate = annual_estimate
+        self.version = 0
+        self._days = array('i')
+        self._readings = array('d')
+        self._rate = None
+
+    def __len__(self):
+        return len(self._days)
+
+    def add_reading(self, d: date, reading: float):
+        o = d.toordinal()
+        i = bisect.bisect_left(self._days, o)
+        if i < len(self._days) and self._days[i] == o:  # a later document of the same day
+            if (i > 0 and reading < self._readings[i - 1]) or \
+               (i + 1 < len(self._days) and reading > self._readings[i + 1]):
+                raise ValueError(f'Error: reading {reading} of {self.point} on {d} '
+                                 f'is not monotonic')
+            self._readings[i] = reading
+        else:
+            if (i > 0 and reading < self._readings[i - 1]) or \
+               (i < len(self._days) and reading > self._readings[i]):
+                raise ValueError(f'Error: reading {reading} of {self.point} on {d} '
+                                 f'is not monotonic')
+            self._days.insert(i, o)
+            self._readings.insert(i, reading)
+        if i == 0 or i >= len(self._days) - 1:
+            self._update_rate()
+        self.version += 1
+
+    def _update_rate(self):
+        if len(self._days) > 1 and self._days[-1] > self._days[0]:
+            self._rate = (self._readings[-1] - self._readings[0]) / \
+                (self._days[-1] - self._days[0])
+        else:
+            self._rate = None
+
+    def rate(self) -> float:  # usage per day
+        if self._rate is not None and self._rate > 0:
+            return self._rate
+        elif self.annual_estimate > 0:
+            return self.annual_estimate / 365
+        else:
+            raise ValueError(f'Error: no usage rate of measuring point {self.point}')
+
+    def reading_at(self, d: date) -> float:
+        if len(self._days) == 0:
+            raise ValueError(f'Error: no readings of measuring point {self.point}')
+        o = d.toordinal()
+        i = bisect.bisect_right(self._days, o)
+        if i == 0:
+            return self._readings[0] - self.rate() * (self._days[0] - o)
+        elif i == len(self._days):
+            return self._readings[-1] + self.rate() * (o - self._days[-1])
+        d0, d1 = self._days[i - 1], self._days[i]
+        r0, r1 = self._readings[i - 1], self._readings[i]
+        return r0 + (r1 - r0) * (o - d0) / (d1 - d0)
+
+    # first day the counter reaches reading
+    def date_of_reading(self, reading: float) -> date:
+        if len(self._days) == 0:
+            raise ValueError(f'Error: no readings of measuring point {self.point}')
+        i = bisect.bisect_left(self._readings, reading)
+        if i == 0:
+            o = self._days[0] - math.floor((self._readings[0] - reading) / self.rate() + 1e-9)
+        elif i == len(self._days):
+            o = self._days[-1] + math.ceil((reading - self._readings[-1]) / self.rate() - 1e-9)
+        else:
+            d0, d1 = self._days[i - 1], self._days[i]
+            r0, r1 = self._readings[i - 1], self._readings[i]
+            o = d0 + math.ceil((reading - r0) * (d1 - d0) / (r1 - r0) - 1e-9)
+        return date.fromordinal(o)
+
+
+# Measurement documents by measuring point, stored in the measuring document table
+# as {point: [[YYYYMMDD, reading], ...]}
+class MeasuringDocuments:
+    def __init__(self, filename=TABLE_MEASURING_DOC):
+        self.filename = filename
+        self._points = {}
+        if filename is not None and os.path.exists(filename):
+            for point, readings in read_data_in_json(filename).items():
+                mp = self.point(point)
+                for d, reading in sorted(readings):
+                    mp.add_reading(str2Date(d), reading)
+
+    def point(self, point: str, annual_estimate: float = None) -> MeasuringPoint:
+        mp = self._points.get(point)
+        if mp is None:
+            mp = self._points[point] = MeasuringPoint(point)
+        if annual_estimate is not None:
+            mp.annual_estimate = annual_estimate
+        return mp
+
+    def add_reading(self, point: str, d: date, reading: float):
+        self.point(point).add_reading(d, reading)
+
+    def save(self, filename=None):
+        data = {point: [[date2Str(date.fromordinal(o)), r]
+                        for o, r in zip(mp._days, mp._readings)]
+                for point, mp in self._points.items()}
+        save_data_in_json(data, self.filename if filename is None else filename)
+
+
 class MaintenancePlan:
     strategy = None
 
@@ -443,8 +1096,10 @@ class MaintenancePlan:
 
         self.scheduling_indicator = plan_params['scheduling_indicator']
         self.factory_calendar = plan_params['factory_calendar']
-        if self.factory_calendar == '00':
-            self.calendar = FactoryCalendar(HOLIDAYS)
+        self.work_center = plan_params.get('work_center', '')
+        registry = SchedulingRegistry.get_instance()
+        if registry.has_calendar(self.factory_calendar):
+            self.calendar = registry.calendar(self.factory_calendar)
 
     def __str__(self):
         return 'Plan: ' + self.plan_num + ' Cycle:' + str(self.cycle) + ' ' \
@@ -460,13 +1115,32 @@ class MaintenancePlan:
         if self.scheduling_indicator == SI_TIME:
             return base_date + timedelta(days=delta_in_days)
         elif self.scheduling_indicator == SI_KEY_DATE:
-            return base_date + MonthDelta(delta_in_days//30)
+            return base_date + _month_delta(delta_in_days//30)
         elif self.scheduling_indicator == SI_FACTORY_CALENDAR:
             return self.calendar.add_workdays(base_date, delta_in_days)
         else:
             raise Exception(f"Error: scheduling indicator {self.scheduling_indicator} \
                             is not allowed")
 
+    # date_add_by_scheduling_indicator() on an array of day ordinals, delta_in_days
+    # is a scalar or an array of the same length; only factory calendar dates are
+    # added one by one
+    def ordinals_add_by_scheduling_indicator(self, ordinals, delta_in_days):
+        ordinals = numpy.asarray(ordinals, dtype=numpy.int64)
+        delta = numpy.asarray(delta_in_days)
+        if self.scheduling_indicator == SI_TIME:  # date + timedelta floors day fractions
+            return ordinals + numpy.floor(delta).astype(numpy.int64)
+        elif self.scheduling_indicator == SI_KEY_DATE:
+            return add_months_to_ordinals(ordinals, numpy.floor_divide(delta, 30))
+        elif self.scheduling_indicator == SI_FACTORY_CALENDAR:
+            delta = numpy.broadcast_to(delta, ordinals.shape)
+            return numpy.array([self.calendar.add_workdays(date.fromordinal(int(o)), d)
+                                .toordinal() for o, d in zip(ordinals, delta.tolist())],
+                               dtype=numpy.int64)
+        else:
+            raise Exception(f"Error: scheduling indicator {self.scheduling_indicator} \
+                            is not allowed")
+
     def next_plan_date(self, base_date: date, start_offset=0, previous_offset=0) -> date:
         return self.date_add_by_scheduling_indicator(base_date, self.cycle_in_days())
 
@@ -477,11 +1151,15 @@ class MaintenancePlan:
         return self.cycle_in_days() * self.SF_early_tolerance // 100
 
     def scheduling_end_date(self) -> date:
-        return datetime.today().date() + timedelta(days=period2days(self.schedule_period,
-                                                                    self.sp_unit))
+        return self.SYSTEM.today() + timedelta(days=period2days(self.schedule_period,
+                                                                self.sp_unit))
 
-    def call_horizon_expired(self, planned_date: date) -> bool:
-        deadline = self.SYSTEM.reference_date()
+    # deadline reference date when the current date is today
+    def reference_date_on(self, today: date) -> date:
+        return today + (self.SYSTEM.reference_date() - self.SYSTEM.today())
+
+    def call_horizon_expired(self, planned_date: date, reference_date: date = None) -> bool:
+        deadline = self.SYSTEM.reference_date() if reference_date is None else reference_date
         return (timedelta_in_days(planned_date, deadline) / self.cycle_in_days()) \
             <= ((100 - self.call_horizon) / 100)
 
@@ -489,6 +1167,68 @@ class MaintenancePlan:
         return plan_date - timedelta(days=self.cycle_in_days()) + \
                timedelta(days=self.cycle_in_days() * self.call_horizon / 100)
 
+    # changes with the data the planned dates depend on besides the plan parameters
+    def readings_version(self):
+        return None
+
+    # Jump-ahead over the planned dates of a plan without completion shifts: call n
+    # (1 based) is the first call stepped n-1 cycles forward, as start_scheduling()
+    # creates them. Only SI_TIME and SI_KEY_DATE plans with the plain cycle steps.
+    def supports_jump_ahead(self) -> bool:
+        return self.scheduling_indicator in (SI_TIME, SI_KEY_DATE) and \
+            type(self).next_plan_date is MaintenancePlan.next_plan_date and \
+            type(self).date_add_by_scheduling_indicator is \
+            MaintenancePlan.date_add_by_scheduling_indicator
+
+    # days and months of one cycle step
+    def _cycle_step(self):
+        if not self.supports_jump_ahead():
+            raise ValueError(f'Error: no jump-ahead for plan {self.plan_num}')
+        if self.scheduling_indicator == SI_TIME:
+            step = (timedelta(days=self.cycle_in_days()).days, 0)
+        else:
+            step = (0, self.cycle_in_days() // 30)
+        if step[0] <= 0 and step[1] <= 0:
+            raise ValueError(f'Error: plan {self.plan_num} has no positive cycle')
+        return step
+
+    def first_planned_date(self) -> date:
+        if self.offset != 0:
+            return self.start_date + timedelta(days=self.offset_in_days())
+        return self.next_plan_date(self.start_date)
+
+    # first_date is the planned date of call 1 (default: first_planned_date())
+    def planned_date_of_call(self, n: int, first_date: date = None) -> date:
+        if n < 1:
+            raise ValueError(f'Error: call number {n} must be positive')
+        if first_date is None:
+            first_date = self.first_planned_date()
+        days, months = self._cycle_step()
+        if months == 0:
+            return first_date + timedelta(days=days * (n - 1))
+        # MonthDelta steps keep a day clamped at a month end, the day is the shortest
+        # month length on the way as long as that is below the first day
+        day = first_date.day
+        m0 = first_date.year * 12 + first_date.month - 1
+        if day > 28:
+            day = min(day, _shortest_month(m0, months, n - 1))
+        year, month = divmod(m0 + (n - 1) * months, 12)
+        return date(year, month + 1, min(day, _month_length(year, month)))
+
+    # number of the last call planned on or before d, 0 before the first call
+    def call_index_of_date(self, d: date, first_date: date = None) -> int:
+        if first_date is None:
+            first_date = self.first_planned_date()
+        if d < first_date:
+            return 0
+        days, months = self._cycle_step()
+        if months == 0:
+            return (d - first_date).days // days + 1
+        n = ((d.year - first_date.year) * 12 + d.month - first_date.month) // months + 1
+        while n > 1 and self.planned_date_of_call(n, first_date) > d:
+            n -= 1
+        return n
+
 
 class StrategyPlan(MaintenancePlan):
     def __init__(self, plan_params: list, strategy: MaintenanceStrategy = None):
@@ -496,10 +1236,8 @@ class StrategyPlan(MaintenancePlan):
 
         self.start_offset = 0
         if strategy is None:
-            self.strategy = MaintenanceStrategy(CCF=self.cycle_change_factor)
-        else:
-            self.strategy = strategy
-            self.strategy.CCF = self.cycle_change_factor
+            raise ValueError(f'Error: strategy plan {self.plan_num} without maintenance strategy')
+        self.strategy = strategy  # may be shared, cycle_change_factor stays in the plan
 
     def __str__(self):
         return f'Plan: {self.plan_num} Cycle:{str(self.cycle)} {self.cycle_unit} \
@@ -509,7 +1247,55 @@ class StrategyPlan(MaintenancePlan):
         next_offset = self.strategy.next_offset(start_offset, previous_offset)
         delta = (next_offset - previous_offset) * self.cycle_change_factor
         return self.date_add_by_scheduling_indicator(base_date, delta)
- 
+
+
+# Counter based plan (SI_COUNTER_BASED or SI_MULTI_COUNTER). plan_params['counters']
+# lists {'point': measuring point, 'cycle': cycle in counter units,
+# 'annual_estimate': optional usage per year}, a single counter plan may give
+# 'measuring_point' and 'annual_estimate' instead and use the plan cycle.
+# counter_logic 'OR' plans at the first counter reaching its cycle, 'AND' at the last.
+# documents is read once by the caller and shared by all counter plans of a run.
+class CounterPlan(MaintenancePlan):
+    def __init__(self, plan_params: list, documents: MeasuringDocuments):
+        super().__init__(plan_params)
+        self.documents = documents
+        self.counter_logic = plan_params.get('counter_logic', 'OR')
+        if self.counter_logic not in ('OR', 'AND'):
+            raise ValueError(f'Error: counter logic {self.counter_logic} is not allowed')
+
+        counters = plan_params.get('counters')
+        if counters is None:
+            counters = [{'point': plan_params['measuring_point'], 'cycle': self.cycle,
+                         'annual_estimate': plan_params.get('annual_estimate')}]
+        if self.scheduling_indicator == SI_COUNTER_BASED and len(counters) != 1:
+            raise ValueError('Error: counter based plan needs exactly one counter')
+        self.counters = [(documents.point(c['point'], c.get('annual_estimate')), c['cycle'])
+                         for c in counters]
+
+    def _combine(self, values):
+        return min(values) if self.counter_logic == 'OR' else max(values)
+
+    # estimated days of one cycle at the current usage rates
+    def cycle_in_days(self) -> float:
+        return self.cycle_change_factor * \
+            self._combine([cycle / mp.rate() for mp, cycle in self.counters])
+
+    def offset_in_days(self) -> float:
+        if self.cycle == 0:
+            return 0
+        return self.cycle_in_days() * self.offset / self.cycle
+
+    # delta_in_days is converted to the share of the counter cycles it covers,
+    # a whole cycle in days is the cycle of every counter
+    def date_add_by_scheduling_indicator(self, base_date: date, delta_in_days: int) -> date:
+        if self.scheduling_indicator not in (SI_COUNTER_BASED, SI_MULTI_COUNTER):
+            return super().date_add_by_scheduling_indicator(base_date, delta_in_days)
+        share = delta_in_days / self.cycle_in_days() * self.cycle_change_factor
+        return self._combine([mp.date_of_reading(mp.reading_at(base_date) + cycle * share)
+                              for mp, cycle in self.counters])
+
+    def readings_version(self):
+        return tuple(mp.version for mp, cycle in self.counters)
     
 class CallFactory:
     def get_call(self, mplan: MaintenancePlan, data=None):
@@ -527,22 +1313,25 @@ class StrategyCallFactory(CallFactory):
 
 
 class Call:
-    _plan = None
-    call_num = 0
-    planned_date = NULL_DATE
-    call_date = NULL_DATE
-    completion_date = NULL_DATE
-    start_date = NULL_DATE
-    last_planned_date = NULL_DATE
-    prev_call_num = 0
-    scheduling_type = ''
-    status = ''
-    previous_offset = 0
-    package_num = 1
-    due_package = ''
+    __slots__ = ('_plan', 'call_num', 'planned_date', 'call_date', 'completion_date',
+                 'start_date', 'last_planned_date', 'prev_call_num', 'scheduling_type',
+                 'status', 'previous_offset', 'package_num', 'due_package', 'prev_call')
 
     def __init__(self, mplan: MaintenancePlan, data=None):  # data can be a list or Call object
         self._plan = mplan
+        self.call_num = 0
+        self.planned_date = NULL_DATE
+        self.call_date = NULL_DATE
+        self.completion_date = NULL_DATE
+        self.start_date = NULL_DATE
+        self.last_planned_date = NULL_DATE
+        self.prev_call_num = 0
+        self.scheduling_type = ''
+        self.status = ''
+        self.previous_offset = 0
+        self.package_num = 1
+        self.due_package = ''
+        self.prev_call = None
         if type(data) is list:
             self.init_by_list(data)
         else:
@@ -551,18 +1340,17 @@ class Call:
     def init_by_prev_call(self, prev_call): pass  # implemented by child classes
     def create_call_object(self): pass  # create WO, NO according to plan category
 
+    # alist as stored or as decoded by decode_call_rows()
     def init_by_list(self, alist: list):
         if alist is not None:  # and len(alist) == 9:
+            if not isinstance(alist[1], date):
+                alist = decode_call_rows([alist])[0]
             self.call_num = alist[0]
-            self.planned_date = str2Date(alist[1])
-            self.call_date = str2Date(alist[2])
-            if len(alist[3]) == 0:
-                self.completion_date = NULL_DATE
-            else:
-                self.completion_date = str2Date(alist[3])
-
-            self.start_date = str2Date(alist[4])
-            self.last_planned_date = str2Date(alist[5])
+            self.planned_date = alist[1]
+            self.call_date = alist[2]
+            self.completion_date = alist[3]
+            self.start_date = alist[4]
+            self.last_planned_date = alist[5]
             self.prev_call_num = alist[6]
             self.scheduling_type = alist[7]
             self.status = alist[8]
@@ -570,7 +1358,7 @@ class Call:
             self.prev_call = None
 
     def release(self):
-        self.call_date = datetime.today().date()
+        self.call_date = self._plan.SYSTEM.today()
         self.status = SS_SAVE_TO_CALL
 
     def complete(self, comp_date: datetime.date):
@@ -639,22 +1427,25 @@ class Call:
         else:
             self.prev_call.completion_date != NULL_DATE
 
-    def get_call_date(self, plan_date) -> date:
+    # today is the current date of the plan clock if None
+    def get_call_date(self, plan_date, today: date = None) -> date:
         result = self._plan.call_date_by_horizon(plan_date)
-        if self._plan.call_horizon_expired(plan_date):
+        reference = None if today is None else self._plan.reference_date_on(today)
+        if self._plan.call_horizon_expired(plan_date, reference):
             if (not self._plan.completion_requirement) or \
                 (self._plan.completion_requirement and
-                 self.prev_call.completion_date is not NULL_DATE):
-                result = datetime.today().date()
+                 (self.prev_call is None or self.prev_call.completion_date is not NULL_DATE)):
+                result = self._plan.SYSTEM.today() if today is None else today
 
         return result
 
-    def get_status(self, plan_date) -> str:
+    def get_status(self, plan_date, today: date = None) -> str:
         result = SS_HOLD
-        if self._plan.call_horizon_expired(plan_date):
+        reference = None if today is None else self._plan.reference_date_on(today)
+        if self._plan.call_horizon_expired(plan_date, reference):
             if (not self._plan.completion_requirement) or \
                 (self._plan.completion_requirement and
-                 self.prev_call.completion_date is not NULL_DATE):
+                 (self.prev_call is None or self.prev_call.completion_date is not NULL_DATE)):
                 result = SS_SAVE_TO_CALL
 
         return result
@@ -668,16 +1459,16 @@ class Call:
         if self.completion_date == NULL_DATE or self.completion_date is None:
             lcd_str = ''
         else:
-            lcd_str = self.completion_date.strftime(YYYYMMDD)
+            lcd_str = date2Str(self.completion_date)
 
         if self.last_planned_date == NULL_DATE or self.last_planned_date is None:
             lpd_str = ''
         else:
-            lpd_str = self.last_planned_date.strftime(YYYYMMDD)
+            lpd_str = date2Str(self.last_planned_date)
 
-        datarow = [self.call_num, self.planned_date.strftime(YYYYMMDD),
-                   self.call_date.strftime(YYYYMMDD), lcd_str,
-                   self.start_date.strftime(YYYYMMDD), lpd_str,
+        datarow = [self.call_num, date2Str(self.planned_date),
+                   date2Str(self.call_date), lcd_str,
+                   date2Str(self.start_date), lpd_str,
                    self.prev_call_num, self.scheduling_type, self.status,
                    self.due_package]
         return datarow
@@ -686,12 +1477,80 @@ class Call:
         return (self.status in [SS_HOLD, SS_FIXED])
 
 
+# Batch codec of whole call lists in the format of Call.get_call_in_list(): every
+# distinct date of the list is parsed or formatted once. Completion and last planned
+# dates are '' for NULL_DATE, the other dates are formatted as they are.
+CALL_ROW_DATES = ('planned_date', 'call_date', 'completion_date', 'start_date',
+                  'last_planned_date')
+
+
+def _encode_columns(call_nums, dates: list, strings: dict, null_key, prev_call_nums,
+                    scheduling_types, statuses, due_packages) -> list:
+    blank = dict(strings)
+    blank[null_key] = ''
+    planned, called, completed, started, last = dates
+    return [list(r) for r in zip(call_nums, map(strings.__getitem__, planned),
+                                 map(strings.__getitem__, called),
+                                 map(blank.__getitem__, completed),
+                                 map(strings.__getitem__, started),
+                                 map(blank.__getitem__, last),
+                                 prev_call_nums, scheduling_types, statuses, due_packages)]
+
+
+# YYYYMMDD texts of the distinct day ordinals, computed as integers by numpy
+def _format_ordinals(ordinals) -> dict:
+    o = numpy.unique(numpy.asarray(ordinals, dtype=numpy.int64))
+    days = (o - EPOCH_ORDINAL).astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    ymd = (months.astype('datetime64[Y]').astype(numpy.int64) + 1970) * 10000 + \
+        (months.astype(numpy.int64) % 12 + 1) * 100 + (days - months).astype(numpy.int64) + 1
+    texts = dict(zip(o.tolist(), ymd.astype(str).tolist()))
+    for k in o[o < FIRST_YYYY_ORDINAL].tolist():  # years before 1000 as formatted before
+        texts[k] = _format_date(date.fromordinal(k))
+    return texts
+
+
+# rows of Call objects, CallRows or a CallTable
+def encode_call_rows(calls) -> list:
+    if isinstance(calls, CallTable):
+        return calls.get_call_list()
+    calls = list(calls)
+    dates = [list(map(operator.attrgetter(name), calls)) for name in CALL_ROW_DATES]
+    distinct = set().union(*dates)
+    distinct.discard(None)
+    distinct = list(distinct)
+    texts = _format_ordinals([d.toordinal() for d in distinct])
+    strings = {d: texts[d.toordinal()] for d in distinct}
+    strings[None] = ''
+    columns = [list(map(operator.attrgetter(name), calls)) for name in
+               ('call_num', 'prev_call_num', 'scheduling_type', 'status', 'due_package')]
+    return _encode_columns(columns[0], dates, strings, NULL_DATE, *columns[1:])
+
+
+# rows with the date strings replaced by dates, NULL_DATE for ''
+def decode_call_rows(rows: list) -> list:
+    dates = {}
+    result = []
+    for r in rows:
+        r = list(r)
+        for i in range(1, 6):
+            d = dates.get(r[i])
+            if d is None:
+                d = dates[r[i]] = str2Date(r[i])
+            r[i] = d
+        result.append(r)
+    return result
+
+
 class SingleCycleCall(Call):
+    __slots__ = ()
+
     def init_by_prev_call(self, prev_call: Call):
         self.prev_call = prev_call
         if prev_call is None:
             if self._plan.offset != 0:
-                self.planned_date = self.start_date + timedelta(days=self._plan.offset_in_days())
+                self.planned_date = self._plan.start_date + \
+                                    timedelta(days=self._plan.offset_in_days())
             else:
                 self.planned_date = self._plan.next_plan_date(self._plan.start_date)
                 self.last_planned_date = NULL_DATE
@@ -718,8 +1577,12 @@ class SingleCycleCall(Call):
 # To do: include basic offset
 # =============================================================================
 class StrategyCall(Call):
-    current_cycle_offset = 0
-    previous_cycle_offset = 0
+    __slots__ = ('current_cycle_offset', 'previous_cycle_offset')
+
+    def __init__(self, mplan: MaintenancePlan, data=None):
+        self.current_cycle_offset = 0
+        self.previous_cycle_offset = 0
+        super().__init__(mplan, data)
 
     def init_by_prev_call(self, prev_call: Call = None):
         self.prev_call = prev_call
@@ -764,48 +1627,1296 @@ class StrategyCall(Call):
 
     def update(self):  # tbc
         super().update()
-    
+
+
+NULL_ORDINAL = NULL_DATE.toordinal()
+STATUS_CODES = ['', SS_HOLD, SS_FIXED, SS_SKIPPED, SS_CALLED, SS_COMPLETED, SS_LOCKED,
+                SS_SAVE_TO_CALL]
+SCHEDULING_TYPE_CODES = ['', ST_NEW_START, ST_SCHEDULED, ST_MANUAL, ST_CYCLE_START]
+
+
+def _ordinal2Date(o: int) -> date:
+    if o == NULL_ORDINAL:
+        return NULL_DATE
+    return date.fromordinal(o)
+
+
+def _date2Ordinal(d: date) -> int:
+    if d is None:
+        return NULL_ORDINAL
+    return d.toordinal()
+
+
+# Columnar storage of the calls of one plan: dates as day ordinals, status, type and
+# due package as small codes of the table and the predecessor as a row index. Rows
+# are read and written through CallRow views made on demand. The call numbers in
+# ascending order and the successor links of each row are kept as int arrays too.
+class CallTable:
+    _date_columns = ('planned_date', 'call_date', 'completion_date', 'start_date',
+                     'last_planned_date')
+    _code_limits = {'b': 127, 'h': 32767}
+
+    def __init__(self, mplan: MaintenancePlan):
+        self._plan = mplan
+        self.call_num = array('i')
+        self.prev_call_num = array('i')
+        self.prev_index = array('i')
+        self.planned_date = array('i')
+        self.call_date = array('i')
+        self.completion_date = array('i')
+        self.start_date = array('i')
+        self.last_planned_date = array('i')
+        self.current_cycle_offset = array('i')
+        self.previous_cycle_offset = array('i')
+        self.status = array('b')
+        self.scheduling_type = array('b')
+        self.due_package = array('h')
+        self._statuses = list(STATUS_CODES)
+        self._status_codes = {v: i for i, v in enumerate(self._statuses)}
+        self._types = list(SCHEDULING_TYPE_CODES)
+        self._type_codes = {v: i for i, v in enumerate(self._types)}
+        self._packages = ['']
+        self._package_codes = {'': 0}
+        self._num_sorted = array('i')  # call numbers in ascending order
+        self._num_rows = array('i')  # row of each number of _num_sorted
+        self._first_successor = array('i')  # first row with this row as predecessor
+        self._next_sibling = array('i')  # next row with the same predecessor
+
+    @staticmethod
+    def from_calls(mplan: MaintenancePlan, calls: list):
+        table = CallTable(mplan)
+        positions = {}  # Calls hash by identity, rows by table position
+        for c in calls:
+            prev = -1 if c.prev_call is None else positions.get(c.prev_call, -1)
+            positions[c] = len(table)
+            table.append(c, prev)
+        return table
+
+    # rows in the format of Call.get_call_in_list(), no Call objects are created
+    @staticmethod
+    def from_rows(mplan: MaintenancePlan, rows: list):
+        table = CallTable(mplan)
+        for r in decode_call_rows(rows):
+            table.call_num.append(r[0])
+            for column, d in zip(CallTable._date_columns, r[1:6]):
+                getattr(table, column).append(d.toordinal())
+            table.prev_call_num.append(r[6])
+            table.prev_index.append(table.row_index(r[6]))
+            table.scheduling_type.append(table._type_code(r[7]))
+            table.status.append(table._status_code(r[8]))
+            table.due_package.append(table._package_code(r[9]))
+            table.current_cycle_offset.append(0)
+            table.previous_cycle_offset.append(0)
+            table._link_row(len(table) - 1)
+        return table
+
+    def _code(self, codes: dict, values: list, value, column: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = len(values)
+            if code > self._code_limits[getattr(self, column).typecode]:
+                raise ValueError(f'Error: too many distinct {column} values in call table')
+            values.append(value)
+            codes[value] = code
+        return code
+
+    def _status_code(self, status: str) -> int:
+        return self._code(self._status_codes, self._statuses, status, 'status')
+
+    def _type_code(self, scheduling_type: str) -> int:
+        return self._code(self._type_codes, self._types, scheduling_type, 'scheduling_type')
+
+    def _package_code(self, text: str) -> int:
+        return self._code(self._package_codes, self._packages, text, 'due_package')
+
+    # indexes the number and the predecessor link of the last appended row i
+    def _link_row(self, i: int):
+        n = self.call_num[i]
+        j = bisect.bisect_right(self._num_sorted, n)  # the first row of a number wins
+        self._num_sorted.insert(j, n)
+        self._num_rows.insert(j, i)
+        self._first_successor.append(-1)
+        self._next_sibling.append(-1)
+        self._link_successor(i)
+
+    def _link_successor(self, i: int):
+        p = self.prev_index[i]
+        if p < 0:
+            return
+        s = self._first_successor[p]
+        if s < 0:
+            self._first_successor[p] = i
+        else:
+            while self._next_sibling[s] >= 0:
+                s = self._next_sibling[s]
+            self._next_sibling[s] = i
+
+    def _unlink_successor(self, i: int):
+        p = self.prev_index[i]
+        if p < 0:
+            return
+        s = self._first_successor[p]
+        if s == i:
+            self._first_successor[p] = self._next_sibling[i]
+        else:
+            while self._next_sibling[s] != i:
+                s = self._next_sibling[s]
+            self._next_sibling[s] = self._next_sibling[i]
+        self._next_sibling[i] = -1
+
+    def set_prev_index(self, i: int, prev_index: int):
+        self._unlink_successor(i)
+        self.prev_index[i] = prev_index
+        self._link_successor(i)
+
+    # row index of the first row with call number n, -1 if there is none
+    def row_index(self, n: int) -> int:
+        j = bisect.bisect_left(self._num_sorted, n)
+        if j < len(self._num_sorted) and self._num_sorted[j] == n:
+            return self._num_rows[j]
+        return -1
+
+    def row_of_num(self, n: int):
+        i = self.row_index(n)
+        return None if i < 0 else CallRow(self, i)
+
+    # rows with row i as predecessor, in the order they were added
+    def successors(self, i: int) -> list:
+        result = []
+        s = self._first_successor[i]
+        while s >= 0:
+            result.append(CallRow(self, s))
+            s = self._next_sibling[s]
+        return result
+
+    def __len__(self):
+        return len(self.call_num)
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('call table index out of range')
+        return CallRow(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield CallRow(self, i)
+
+    def rows(self) -> list:
+        return list(self)
+
+    # copies a Call (or CallRow) into the table and returns its row view, the
+    # predecessor is given by its row index or found by the prev_call of c: a row of
+    # this table, or else the row of its call number
+    def append(self, c, prev_index=None):
+        if prev_index is None:
+            prev = c.prev_call
+            if prev is None:
+                prev_index = -1
+            elif isinstance(prev, CallRow) and prev._table is self:
+                prev_index = prev._i
+            else:
+                prev_index = self.row_index(prev.call_num)
+
+        i = len(self)
+        self.call_num.append(c.call_num)
+        self.prev_call_num.append(c.prev_call_num)
+        self.prev_index.append(prev_index)
+        for column in self._date_columns:
+            getattr(self, column).append(_date2Ordinal(getattr(c, column)))
+        self.current_cycle_offset.append(getattr(c, 'current_cycle_offset', 0))
+        self.previous_cycle_offset.append(getattr(c, 'previous_cycle_offset', 0))
+        self.status.append(self._status_code(c.status))
+        self.scheduling_type.append(self._type_code(c.scheduling_type))
+        self.due_package.append(self._package_code(c.due_package))
+        self._link_row(i)
+        return CallRow(self, i)
+
+    def get_call_list(self) -> list:
+        dates = [getattr(self, column) for column in self._date_columns]
+        strings = _format_ordinals(numpy.concatenate([numpy.frombuffer(column, dtype=numpy.int32)
+                                                      for column in dates] + [[NULL_ORDINAL]]))
+        return _encode_columns(self.call_num, dates, strings, NULL_ORDINAL, self.prev_call_num,
+                               [self._types[v] for v in self.scheduling_type],
+                               [self._statuses[v] for v in self.status],
+                               [self._packages[v] for v in self.due_package])
+
+
+def _call_table_property(column: str, decode, encode):
+    def fget(self):
+        return decode(self._table, getattr(self._table, column)[self._i])
+
+    def fset(self, value):
+        getattr(self._table, column)[self._i] = encode(self._table, value)
+
+    return property(fget, fset)
+
+
+def _date_property(column: str):
+    return _call_table_property(column, lambda t, v: _ordinal2Date(v),
+                                lambda t, v: _date2Ordinal(v))
+
+
+def _int_property(column: str):
+    return _call_table_property(column, lambda t, v: v, lambda t, v: v)
+
+
+# Set of call numbers as a sorted int array, 4 bytes per number
+class CallNumberSet:
+    def __init__(self, numbers=()):
+        self._numbers = array('i', sorted(set(numbers)))
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, n: int) -> bool:
+        j = bisect.bisect_left(self._numbers, n)
+        return j < len(self._numbers) and self._numbers[j] == n
+
+    def __iter__(self):
+        return iter(self._numbers)
+
+    def add(self, n: int):
+        j = bisect.bisect_left(self._numbers, n)
+        if j == len(self._numbers) or self._numbers[j] != n:
+            self._numbers.insert(j, n)
+
+    def discard(self, n: int):
+        j = bisect.bisect_left(self._numbers, n)
+        if j < len(self._numbers) and self._numbers[j] == n:
+            del self._numbers[j]
+
+
+# View of one row of a CallTable with the attributes and methods of Call
+class CallRow:
+    __slots__ = ('_table', '_i')
+
+    def __init__(self, table: CallTable, i: int):
+        self._table = table
+        self._i = i
+
+    def __eq__(self, other):
+        return isinstance(other, CallRow) and self._table is other._table and \
+            self._i == other._i
+
+    def __hash__(self):
+        return hash((id(self._table), self._i))
+
+    @property
+    def _plan(self):
+        return self._table._plan
+
+    @property
+    def prev_call(self):
+        i = self._table.prev_index[self._i]
+        return None if i < 0 else CallRow(self._table, i)
+
+    @prev_call.setter
+    def prev_call(self, c):
+        if c is None:
+            self._table.set_prev_index(self._i, -1)
+        elif isinstance(c, CallRow) and c._table is self._table:
+            self._table.set_prev_index(self._i, c._i)
+        else:
+            raise ValueError('Error: previous call must be a row of the same call table')
+
+    call_num = _int_property('call_num')
+    prev_call_num = _int_property('prev_call_num')
+    current_cycle_offset = _int_property('current_cycle_offset')
+    previous_cycle_offset = _int_property('previous_cycle_offset')
+    planned_date = _date_property('planned_date')
+    call_date = _date_property('call_date')
+    completion_date = _date_property('completion_date')
+    start_date = _date_property('start_date')
+    last_planned_date = _date_property('last_planned_date')
+    status = _call_table_property('status', lambda t, v: t._statuses[v],
+                                  lambda t, v: t._status_code(v))
+    scheduling_type = _call_table_property('scheduling_type', lambda t, v: t._types[v],
+                                           lambda t, v: t._type_code(v))
+    due_package = _call_table_property('due_package', lambda t, v: t._packages[v],
+                                       lambda t, v: t._package_code(v))
+
+    # the Call methods only work on the attributes above
+    create_call_object = Call.create_call_object
+    release = Call.release
+    complete = Call.complete
+    skip = Call.skip
+    fix = Call.fix
+    update = Call.update
+    tolerance_exceeded = Call.tolerance_exceeded
+    shifting_days = Call.shifting_days
+    prev_call_completed = Call.prev_call_completed
+    get_call_date = Call.get_call_date
+    get_status = Call.get_status
+    get_call_in_list = Call.get_call_in_list
+    on_hold_or_fixed = Call.on_hold_or_fixed
+    __str__ = Call.__str__
+
+
+# Persisted calls of all plans by status and planned or call date: the sorted day
+# ordinals of each (status, date kind) with the (plan_num, call_num) of each day.
+# A range query bisects the days and touches only the matching calls.
+class CallDateIndex:
+    date_columns = {'planned': 1, 'call': 2}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._plans = {}  # plan_num -> {call_num: (status, planned ordinal, call ordinal)}
+        self._days = {}  # (status, date kind) -> sorted day ordinals
+        self._calls = {}  # (status, date kind) -> {day ordinal: set of (plan_num, call_num)}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._plans.values())
+
+    def _add(self, key, o: int, call):
+        by_day = self._calls.get(key)
+        if by_day is None:
+            by_day = self._calls[key] = {}
+            self._days[key] = []
+        calls = by_day.get(o)
+        if calls is None:
+            calls = by_day[o] = set()
+            bisect.insort(self._days[key], o)
+        calls.add(call)
+
+    def _remove(self, key, o: int, call):
+        by_day = self._calls[key]
+        calls = by_day[o]
+        calls.discard(call)
+        if len(calls) == 0:
+            del by_day[o]
+            days = self._days[key]
+            del days[bisect.bisect_left(days, o)]
+
+    @staticmethod
+    def _entry(r: list) -> tuple:
+        return r[8], str2Date(r[1]).toordinal(), str2Date(r[2]).toordinal()
+
+    def _remove_call(self, plan_num: str, entries: dict, call_num: int):
+        entry = entries.pop(call_num, None)
+        if entry is not None:
+            status, planned, called = entry
+            self._remove((status, 'planned'), planned, (plan_num, call_num))
+            self._remove((status, 'call'), called, (plan_num, call_num))
+
+    def _add_call(self, plan_num: str, entries: dict, call_num: int, entry: tuple):
+        self._remove_call(plan_num, entries, call_num)
+        status, planned, called = entry
+        self._add((status, 'planned'), planned, (plan_num, call_num))
+        self._add((status, 'call'), called, (plan_num, call_num))
+        entries[call_num] = entry
+
+    # rows in the format of Call.get_call_in_list()
+    def update_rows(self, plan_num: str, rows: list):
+        new_entries = [(r[0], self._entry(r)) for r in rows]
+        with self._lock:
+            entries = self._plans.get(plan_num, {})
+            for call_num in list(entries):
+                self._remove_call(plan_num, entries, call_num)
+            for call_num, entry in new_entries:
+                self._add_call(plan_num, entries, call_num, entry)
+            self._plans[plan_num] = entries
+
+    # upserted rows and deleted call numbers of one plan, see ScheduleStore.apply_delta()
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        new_entries = [(r[0], self._entry(r)) for r in upserts]
+        with self._lock:
+            entries = self._plans.setdefault(plan_num, {})
+            for call_num in deletes:
+                self._remove_call(plan_num, entries, call_num)
+            for call_num, entry in new_entries:
+                self._add_call(plan_num, entries, call_num, entry)
+
+    def load(self, store, plan_nums: list):
+        for plan_num, rows in store.load_plans(plan_nums).items():
+            self.update_rows(plan_num, rows)
+
+    # (plan_num, call_num) of the calls with a status in statuses and planned (or call)
+    # date in [start, end], ordered by date
+    def calls_due(self, start: date, end: date, statuses=(SS_HOLD, SS_SAVE_TO_CALL),
+                  kind='planned') -> list:
+        if kind not in self.date_columns:
+            raise ValueError(f'Error: unknown date kind {kind}')
+        lo = start.toordinal()
+        hi = end.toordinal()
+        result = []
+        with self._lock:
+            for status in statuses:
+                days = self._days.get((status, kind))
+                if days is None:
+                    continue
+                by_day = self._calls[(status, kind)]
+                for i in range(bisect.bisect_left(days, lo), bisect.bisect_right(days, hi)):
+                    result.extend((days[i], c) for c in by_day[days[i]])
+        result.sort()
+        return [c for o, c in result]
+
+
+# stored rows of a plan with the rows of upserts replaced in place (new call
+# numbers appended) and the call numbers of deletes removed
+def _merge_rows(rows: list, upserts: list, deletes: list) -> list:
+    changed = {r[0]: r for r in upserts}
+    for call_num in deletes:
+        changed.setdefault(call_num, None)
+    result = []
+    for r in rows:
+        if r[0] in changed:
+            r = changed.pop(r[0])
+            if r is None:
+                continue
+        result.append(r)
+    result.extend(r for r in changed.values() if r is not None)
+    return result
+
+
+# Persistence of the call lists of maintenance plans, one row per call in the
+# format of Call.get_call_in_list()
+class ScheduleStore:
+    index: CallDateIndex = None  # built by the first calls_due(), kept up to date on save
+
+    def load_plan(self, plan_num: str) -> list:
+        pass
+
+    def save_plan(self, plan_num: str, rows: list):
+        pass
+
+    def load_plans(self, plan_nums: list) -> dict:
+        return {num: self.load_plan(num) for num in plan_nums}
+
+    def save_plans(self, plans: dict):
+        for num, rows in plans.items():
+            self.save_plan(num, rows)
+
+    # Writes the changes of one plan: rows inserted or replaced by call_num, and the
+    # call numbers deleted. Unchanged rows are kept as stored.
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        self.save_plan(plan_num, _merge_rows(self.load_plan(plan_num), upserts, deletes))
+
+    def plan_nums(self) -> list:
+        return []
+
+    def _index_plans(self, plans: dict):
+        if self.index is not None:
+            for num, rows in plans.items():
+                self.index.update_rows(num, rows)
+
+    def _index_delta(self, plan_num: str, upserts: list, deletes: list):
+        if self.index is not None:
+            self.index.apply_delta(plan_num, upserts, deletes)
+
+    # (plan_num, call_num) of the persisted calls with a status in statuses and
+    # planned (or call) date in [start, end]
+    def calls_due(self, start: date, end: date, statuses=(SS_HOLD, SS_SAVE_TO_CALL),
+                  kind='planned') -> list:
+        if self.index is None:
+            index = CallDateIndex()
+            index.load(self, self.plan_nums())
+            self.index = index
+        return self.index.calls_due(start, end, statuses, kind)
+
+    # the index is rebuilt where needed, e.g. in worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('index', None)
+        return state
+
+
+# All plans in one JSON document, every save rewrites the whole file
+class JsonScheduleStore(ScheduleStore):
+    def __init__(self, filename=TABLE_SCHEDULE):
+        self.filename = filename
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.filename):
+            return {}
+        return read_data_in_json(self.filename)
+
+    def load_plan(self, plan_num: str) -> list:
+        return self.load_plans([plan_num])[plan_num]
+
+    def load_plans(self, plan_nums: list) -> dict:
+        if not os.path.exists(self.filename):
+            data = {}
+        else:
+            data = read_plans_in_json(self.filename, plan_nums)
+        return {num: data.get(num, []) for num in plan_nums}
+
+    def save_plan(self, plan_num: str, rows: list):
+        self.save_plans({plan_num: rows})
+
+    def save_plans(self, plans: dict):
+        with _named_lock('file', os.path.abspath(self.filename)):  # threads of this process
+            data = self._read()
+            data.update(plans)
+            save_data_in_json(data, self.filename)
+        self._index_plans(plans)
+
+    # the document is rewritten anyway, but only the changed rows are converted
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        with _named_lock('file', os.path.abspath(self.filename)):
+            data = self._read()
+            data[plan_num] = _merge_rows(data.get(plan_num, []), upserts, deletes)
+            save_data_in_json(data, self.filename)
+        self._index_delta(plan_num, upserts, deletes)
+
+    def plan_nums(self) -> list:
+        return list(self._read())
+
+
+# One sqlite row per call clustered by (plan_num, call_num), loading or saving a
+# plan only touches the rows of that plan
+class SqliteScheduleStore(ScheduleStore):
+    COLUMNS = ('call_num', 'planned_date', 'call_date', 'completion_date', 'start_date',
+               'last_planned_date', 'prev_call_num', 'scheduling_type', 'status',
+               'due_package')
+
+    def __init__(self, filename=TABLE_SCHEDULE_DB):
+        self.filename = filename
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> its connection
+
+    # one connection per thread, the connections of ended threads are closed when
+    # another thread connects
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.filename, timeout=30,
+                                                      check_same_thread=False)
+            with self._lock:
+                for thread in [t for t in self._connections if not t.is_alive()]:
+                    self._connections.pop(thread).close()
+                self._connections[threading.current_thread()] = conn
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS schedule ('
+                'plan_num TEXT NOT NULL, call_num INTEGER NOT NULL, '
+                'planned_date TEXT, call_date TEXT, completion_date TEXT, '
+                'start_date TEXT, last_planned_date TEXT, prev_call_num INTEGER, '
+                'scheduling_type TEXT, status TEXT, due_package TEXT, '
+                'PRIMARY KEY (plan_num, call_num)) WITHOUT ROWID')
+            # YYYYMMDD texts sort like dates, the indexes cover (plan_num, call_num)
+            conn.execute('CREATE INDEX IF NOT EXISTS schedule_planned '
+                         'ON schedule (status, planned_date)')
+            conn.execute('CREATE INDEX IF NOT EXISTS schedule_call '
+                         'ON schedule (status, call_date)')
+            conn.commit()
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+            self._local = threading.local()
+
+    # connections are not shared with other processes, each opens its own
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state['_local']
+        del state['_lock']
+        state['_connections'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def load_plan(self, plan_num: str) -> list:
+        cur = self._connection().execute(
+            f'SELECT {", ".join(self.COLUMNS)} FROM schedule '
+            'WHERE plan_num = ? ORDER BY call_num', (plan_num,))
+        return [list(r) for r in cur]
+
+    def save_plan(self, plan_num: str, rows: list):
+        self.save_plans({plan_num: rows})
+
+    def save_plans(self, plans: dict):
+        conn = self._connection()
+        insert = (f'INSERT INTO schedule (plan_num, {", ".join(self.COLUMNS)}) '
+                  f'VALUES (?{", ?" * len(self.COLUMNS)})')
+        with conn:
+            for num, rows in plans.items():
+                conn.execute('DELETE FROM schedule WHERE plan_num = ?', (num,))
+                conn.executemany(insert, ([num] + list(r) for r in rows))
+
+    # one statement per changed row in a single transaction
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        conn = self._connection()
+        upsert = (f'INSERT OR REPLACE INTO schedule (plan_num, {", ".join(self.COLUMNS)}) '
+                  f'VALUES (?{", ?" * len(self.COLUMNS)})')
+        with conn:
+            conn.executemany('DELETE FROM schedule WHERE plan_num = ? AND call_num = ?',
+                             ((plan_num, n) for n in deletes))
+            conn.executemany(upsert, ([plan_num] + list(r) for r in upserts))
+
+    def plan_nums(self) -> list:
+        return [r[0] for r in self._connection().execute('SELECT DISTINCT plan_num FROM schedule')]
+
+    # answered by the sqlite indexes, no index in memory
+    def calls_due(self, start: date, end: date, statuses=(SS_HOLD, SS_SAVE_TO_CALL),
+                  kind='planned') -> list:
+        column = {'planned': 'planned_date', 'call': 'call_date'}.get(kind)
+        if column is None:
+            raise ValueError(f'Error: unknown date kind {kind}')
+        cur = self._connection().execute(
+            f'SELECT plan_num, call_num FROM schedule WHERE status IN '
+            f'({", ".join("?" * len(statuses))}) AND {column} BETWEEN ? AND ? '
+            f'ORDER BY {column}, plan_num, call_num',
+            (*statuses, date2Str(start), date2Str(end)))
+        return [tuple(r) for r in cur]
+
+
+# Advisory exclusive lock on a lock file, held across processes while a shard is
+# rewritten. Waits with growing pauses up to timeout seconds, then raises TimeoutError.
+class FileLock:
+    def __init__(self, filename, timeout=FILE_LOCK_TIMEOUT):
+        self.filename = filename
+        self.timeout = timeout
+        self._f = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:  # held by another process or file object
+            return False
+
+    def __enter__(self):
+        self._f = open(self.filename, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        pause = 0.001
+        while not self._try_lock():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                self._f.close()
+                self._f = None
+                raise TimeoutError(f'Error: lock {self.filename} not acquired '
+                                   f'in {self.timeout} seconds')
+            time.sleep(min(pause, left))
+            pause = min(pause * 2, 0.1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+            self._f = None
+
+
+# Plans partitioned by crc32(plan_num) into shard JSON files of a directory. A save
+# rewrites only the shards of the saved plans, each under its lock file and by
+# renaming a complete temp file over it, so readers never see a partial shard and
+# concurrent writers of different plans do not lose each other's updates.
+class ShardedJsonScheduleStore(ScheduleStore):
+    def __init__(self, directory=TABLE_SCHEDULE_SHARDS, shards=64):
+        self.directory = directory
+        self.shards = shards
+        os.makedirs(directory, exist_ok=True)
+
+    def _shard(self, plan_num: str) -> int:
+        return zlib.crc32(plan_num.encode('utf-8')) % self.shards
+
+    def _shard_file(self, shard: int) -> str:
+        return os.path.join(self.directory, f'shard_{shard:04d}.json')
+
+    def _read_shard(self, shard: int) -> dict:
+        filename = self._shard_file(shard)
+        if not os.path.exists(filename):
+            return {}
+        return read_data_in_json(filename)
+
+    def _write_shard(self, shard: int, data: dict):
+        fd, tmp = tempfile.mkstemp(prefix=f'shard_{shard:04d}.', suffix='.tmp',
+                                   dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._shard_file(shard))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _by_shard(self, plan_nums) -> dict:
+        shards = {}
+        for num in plan_nums:
+            shards.setdefault(self._shard(num), []).append(num)
+        return shards
+
+    def load_plan(self, plan_num: str) -> list:
+        return self._read_shard(self._shard(plan_num)).get(plan_num, [])
+
+    def load_plans(self, plan_nums: list) -> dict:
+        result = {}
+        for shard, nums in self._by_shard(plan_nums).items():
+            data = self._read_shard(shard)
+            for num in nums:
+                result[num] = data.get(num, [])
+        return result
+
+    def save_plan(self, plan_num: str, rows: list):
+        self.save_plans({plan_num: rows})
+
+    def save_plans(self, plans: dict):
+        for shard, nums in self._by_shard(plans).items():
+            with FileLock(self._shard_file(shard) + '.lock'):
+                data = self._read_shard(shard)
+                for num in nums:
+                    data[num] = plans[num]
+                self._write_shard(shard, data)
+        self._index_plans(plans)
+
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        shard = self._shard(plan_num)
+        with FileLock(self._shard_file(shard) + '.lock'):
+            data = self._read_shard(shard)
+            data[plan_num] = _merge_rows(data.get(plan_num, []), upserts, deletes)
+            self._write_shard(shard, data)
+        self._index_delta(plan_num, upserts, deletes)
+
+    def plan_nums(self) -> list:
+        nums = []
+        for shard in range(self.shards):
+            nums.extend(self._read_shard(shard))
+        return nums
+
+
+# Plans kept in memory, used to hand preloaded call lists to schedulers
+class MemoryScheduleStore(ScheduleStore):
+    def __init__(self, plans: dict = None):
+        self.plans = {} if plans is None else plans
+
+    def load_plan(self, plan_num: str) -> list:
+        return [list(r) for r in self.plans.get(plan_num, [])]
+
+    def save_plan(self, plan_num: str, rows: list):
+        self.plans[plan_num] = [list(r) for r in rows]
+        self._index_plans({plan_num: self.plans[plan_num]})
+
+    def apply_delta(self, plan_num: str, upserts: list, deletes: list):
+        upserts = [list(r) for r in upserts]
+        self.plans[plan_num] = _merge_rows(self.plans.get(plan_num, []), upserts, deletes)
+        self._index_delta(plan_num, upserts, deletes)
+
+    def plan_nums(self) -> list:
+        return list(self.plans)
+
+
+# Fenwick tree of counts per day ordinal over the range of days counted so far. The
+# range starts with DAY_COUNTER_MIN_DAYS days around the first day and doubles to
+# take in a day outside of it.
+class DayCounter:
+    def __init__(self):
+        self._first = 0
+        self._tree = array('q', [0])
+
+    def __len__(self):
+        return len(self._tree) - 1
+
+    def _grow(self, o: int):
+        size = len(self._tree) - 1
+        if size == 0:
+            lo, hi = o, o + 1
+        else:
+            lo, hi = min(self._first, o), max(self._first + size, o + 1)
+        new_size = max(DAY_COUNTER_MIN_DAYS, 1 << (2 * (hi - lo) - 1).bit_length())
+        first = lo - (new_size - (hi - lo)) // 2
+        # counts per day out of the old tree, then the new tree in linear time
+        tree = self._tree
+        for i in range(size, 0, -1):
+            j = i + (i & -i)
+            if j <= size:
+                tree[j] -= tree[i]
+        new_tree = array('q', bytes(8 * (new_size + 1)))
+        shift = self._first - first
+        for i in range(1, size + 1):
+            new_tree[i + shift] = tree[i]
+        for i in range(1, new_size + 1):
+            j = i + (i & -i)
+            if j <= new_size:
+                new_tree[j] += new_tree[i]
+        self._first = first
+        self._tree = new_tree
+
+    def add(self, o: int, n: int):
+        i = o - self._first + 1
+        if not 0 < i < len(self._tree):
+            self._grow(o)
+            i = o - self._first + 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += n
+            i += i & -i
+
+    # calls on days before ordinal o
+    def count_before(self, o: int) -> int:
+        i = min(max(o - self._first, 0), len(self._tree) - 1)
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+# Workload over all plans: number of open calls per planned date and per call date,
+# in total and per work center. Plans are indexed from their calls or from stored
+# rows, re-indexing a plan applies only the differences. Schedulers attached with
+# watch() re-index their plan after refresh_calls(), update_scheduling() and
+# save_to_DB().
+class WorkloadIndex:
+    open_statuses = (SS_HOLD, SS_FIXED, SS_SAVE_TO_CALL, SS_CALLED)
+    date_kinds = ('planned', 'call')
+
+    def __init__(self):
+        self._days = str2Date(WORKLOAD_END_DATE).toordinal() - NULL_ORDINAL
+        self._lock = threading.Lock()
+        self._plans = {}  # plan_num -> (work center, planned ordinals, call ordinals)
+        self._counters = {}  # (date kind, work center or None) -> DayCounter
+
+    def _counter(self, kind: str, work_center) -> DayCounter:
+        counter = self._counters.get((kind, work_center))
+        if counter is None:
+            counter = self._counters[(kind, work_center)] = DayCounter()
+        return counter
+
+    def _apply(self, kind: str, work_center, old: list, new: list):
+        diff = collections.Counter(new)
+        diff.subtract(old)
+        for o, n in diff.items():
+            if n != 0 and o != NULL_ORDINAL:
+                if not NULL_ORDINAL < o < NULL_ORDINAL + self._days:
+                    raise ValueError(f'Error: date {_ordinal2Date(o)} outside the workload index')
+                self._counter(kind, None).add(o, n)
+                if work_center:
+                    self._counter(kind, work_center).add(o, n)
+
+    def _update(self, plan_num: str, work_center, planned: list, called: list):
+        with self._lock:
+            old_center, old_planned, old_called = self._plans.get(plan_num, (None, [], []))
+            if old_center != work_center:
+                self._apply('planned', old_center, old_planned, [])
+                self._apply('call', old_center, old_called, [])
+                old_planned, old_called = [], []
+            self._apply('planned', work_center, old_planned, planned)
+            self._apply('call', work_center, old_called, called)
+            self._plans[plan_num] = (work_center, planned, called)
+
+    def update_calls(self, plan_num: str, calls: list, work_center=None):
+        calls = [c for c in calls if c.status in self.open_statuses]
+        self._update(plan_num, work_center, [c.planned_date.toordinal() for c in calls],
+                     [c.call_date.toordinal() for c in calls])
+
+    # rows in the format of Call.get_call_in_list()
+    def update_rows(self, plan_num: str, rows: list, work_center=None):
+        rows = [r for r in rows if r[8] in self.open_statuses]
+        self._update(plan_num, work_center, [str2Date(r[1]).toordinal() for r in rows],
+                     [str2Date(r[2]).toordinal() for r in rows])
+
+    def remove_plan(self, plan_num: str):
+        self._update(plan_num, None, [], [])
+        with self._lock:
+            del self._plans[plan_num]
+
+    def load(self, store: ScheduleStore, plan_nums: list, work_centers: dict = None):
+        for plan_num, rows in store.load_plans(plan_nums).items():
+            self.update_rows(plan_num, rows, (work_centers or {}).get(plan_num))
+
+    def watch(self, s):
+        s.workload = self
+        s.update_workload()
+
+    # open calls with planned (or call) date in [start, end]
+    def count(self, start: date, end: date, kind='planned', work_center=None) -> int:
+        counter = self._counters.get((kind, work_center))
+        if counter is None or end < start:
+            return 0
+        return counter.count_before(end.toordinal() + 1) - \
+            counter.count_before(start.toordinal())
+
+    # open calls per bucket of bucket_days days from start on, the last bucket ends
+    # at end; returns (bucket start, count) pairs
+    def histogram(self, start: date, end: date, bucket_days=7, kind='planned',
+                  work_center=None) -> list:
+        counter = self._counters.get((kind, work_center))
+        result = []
+        o = start.toordinal()
+        last = end.toordinal() + 1
+        below = 0 if counter is None else counter.count_before(o)
+        while o < last:
+            nxt = min(o + bucket_days, last)
+            upto = 0 if counter is None else counter.count_before(nxt)
+            result.append((_ordinal2Date(o), upto - below))
+            below = upto
+            o = nxt
+        return result
+
+
+# Creation of the call objects (work orders, notifications) of released calls in
+# batches on a bounded thread pool shared by all submits of the sink. A failed batch
+# is retried with exponential backoff, submit() returns the acknowledged calls and
+# the error by call_num of the others. Subclasses implement send_batch();
+# (plan_num, call_num) identifies a call object when a batch is resent.
+class CallObjectSink:
+    def __init__(self, batch_size=100, workers=8, retries=3, backoff=0.5):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # returns one acknowledgement flag per call, raises to retry the batch
+    def send_batch(self, mplan: MaintenancePlan, calls: list) -> list:
+        pass
+
+    # returns the acknowledgement flags and the error of the last attempt, if any
+    def _send_with_retry(self, mplan: MaintenancePlan, calls: list):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.send_batch(mplan, calls), None
+            except Exception as e:
+                if attempt == self.retries:
+                    return [False] * len(calls), f'{type(e).__name__}: {e}'
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def submit(self, mplan: MaintenancePlan, calls: list):
+        batches = [calls[i:i + self.batch_size] for i in range(0, len(calls), self.batch_size)]
+        acknowledged = []
+        errors = {}
+        if len(batches) == 0:
+            return acknowledged, errors
+        results = self._executor().map(lambda b: self._send_with_retry(mplan, b), batches)
+        for b, (acks, error) in zip(batches, results):
+            for c, ok in zip(b, acks):
+                if ok:
+                    acknowledged.append(c)
+                else:
+                    errors[c.call_num] = error or 'not acknowledged'
+        return acknowledged, errors
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# In-process sink for testing: records the created call objects by
+# (plan_num, call_num), optionally waits latency seconds per batch and fails the
+# first `failures` batches
+class LocalCallObjectSink(CallObjectSink):
+    def __init__(self, batch_size=100, workers=8, retries=3, backoff=0.0,
+                 latency=0.0, failures=0):
+        super().__init__(batch_size, workers, retries, backoff)
+        self.latency = latency
+        self.failures = failures
+        self.created = {}
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def send_batch(self, mplan: MaintenancePlan, calls: list) -> list:
+        with self._lock:
+            self.batches += 1
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError('simulated downstream failure')
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            for c in calls:
+                c.create_call_object()
+                self.created[(mplan.plan_num, c.call_num)] = c.call_date
+        return [True] * len(calls)
+
+
 class Scheduler:
     call_factory: CallFactory = None
+    store: ScheduleStore = None
+    sink: CallObjectSink = None  # None creates the call objects one by one
+    window_days = None  # days ahead of today with materialized calls, None for all
+    workload: WorkloadIndex = None  # set by WorkloadIndex.watch()
 
-    def __init__(self, p: MaintenancePlan, call_obj_interval=0):
+    def __init__(self, p: MaintenancePlan, call_obj_interval=0, store: ScheduleStore = None,
+                 sink: CallObjectSink = None, window_days=None, clock: Clock = None):
         SYSTEM = System.get_instance(call_obj_interval)  # init deadline reference date
+        if clock is not None:  # current and reference date of this plan only
+            p.SYSTEM = clock
         self._plan = p
+        self._lock = _named_lock('plan', p.plan_num)
         self.calls = []
+        if store is None:
+            self.store = JsonScheduleStore(TABLE_SCHEDULE)
+        else:
+            self.store = store
+        self.sink = sink
+        self.window_days = window_days
+        self._refresh_key = None
+        self._dirty = {}
+        self._changed = {}  # call_nums changed since the last save, in change order
+        self._persisted = None  # call_nums in the store, None saves the whole plan
+        self._reindex_calls()
         self.load_from_DB()
 
-    def load_from_DB(self, db=TABLE_SCHEDULE):
-        self.DB = read_data_in_json(db)
-        try:
-            call_list = self.DB[self._plan.plan_num]
-        except Exception:
-            call_list = []
-        for row in call_list:
-            _call = self.call_factory.get_call(self._plan, row)
-            self.calls.append(_call)
-            # set prev call
-            for c in self.calls:
-                if c.call_num == _call.prev_call_num:
-                    _call.prev_call = c
-                    break
-
-    def save_to_DB(self, db=TABLE_SCHEDULE):
+    # call_num -> Call index over self.calls, with the highest scheduled and manual
+    # call numbers, and the successors of each call by prev_call. A CallTable has
+    # these indexes itself, see compact_calls().
+    def _reindex_calls(self):
+        self._last_scheduled_num = None
+        self._last_manual_num = None
+        if isinstance(self.calls, CallTable):
+            self._calls_by_num = None
+            self._successors = None
+            manual = self.calls._type_codes.get(ST_MANUAL)
+            for n, t in zip(self.calls.call_num, self.calls.scheduling_type):
+                self._index_number(n, t == manual)
+            if self._dirty:
+                self._dirty = {c: None for c in self._dirty
+                               if isinstance(c, CallRow) and c._table is self.calls}
+            return
+
+        self._calls_by_num = {}
+        self._successors = {}
         for c in self.calls:
-            if c.status == SS_SAVE_TO_CALL:
-                c.create_call_object()  # create WO/NO here
-                c.status = SS_CALLED
+            self._index_call(c)
+        if self._dirty:
+            live = set(self.calls)
+            self._dirty = {c: None for c in self._dirty if c in live}
+
+    def _index_call(self, c: Call):
+        self._calls_by_num.setdefault(c.call_num, c)
+        if c.prev_call is not None:
+            self._successors.setdefault(c.prev_call, []).append(c)
+        self._index_number(c.call_num, c.scheduling_type == ST_MANUAL)
+
+    def _index_number(self, n: int, manual: bool):
+        if manual:
+            if self._last_manual_num is None or n > self._last_manual_num:
+                self._last_manual_num = n
+        elif self._last_scheduled_num is None or n > self._last_scheduled_num:
+            self._last_scheduled_num = n
+
+    def _call_of_num(self, n: int) -> Call:
+        if self._calls_by_num is None:
+            return self.calls.row_of_num(n)
+        return self._calls_by_num.get(n)
+
+    def _successors_of(self, c: Call) -> list:
+        if self._successors is None:
+            return self.calls.successors(c._i) if c._table is self.calls else []
+        return self._successors.get(c, ())
+
+    # a CallTable keeps a copy of the call, its row stands for the call afterwards
+    def _add_call(self, c: Call):
+        if isinstance(self.calls, CallTable):
+            c = self.calls.append(c)
+            self._index_number(c.call_num, c.scheduling_type == ST_MANUAL)
+        else:
+            self.calls.append(c)
+            self._index_call(c)
+        self.mark_dirty(c)
+
+    # replaces the calls by the given ones, a compacted schedule stays compacted
+    def _set_calls(self, calls: list):
+        if isinstance(self.calls, CallTable):
+            self.calls = CallTable.from_calls(self._plan, calls)
+        else:
+            self.calls = calls
+        self._reindex_calls()
 
-        self.DB[self._plan.plan_num] = self.get_call_list()
-        save_data_in_json(self.DB, db)
+    # the persisted columns Call.update() can change
+    @staticmethod
+    def _call_state(c: Call) -> tuple:
+        return (c.planned_date, c.call_date, c.completion_date, c.last_planned_date,
+                c.status, c.due_package)
+
+    # Calls to recompute in the next refresh_calls() and to write in the next
+    # save_to_DB(). Changes made to calls or to the plan outside the Scheduler
+    # methods need mark_dirty() or invalidate(); plan parameters and the
+    # current/reference dates are checked by refresh_calls().
+    @_synchronized
+    def mark_dirty(self, c: Call, successors=False):
+        self._changed[c.call_num] = None
+        if successors:
+            for n in self._successors_of(c):
+                self._dirty[n] = None
+        else:
+            self._dirty[c] = None
+
+    @_synchronized
+    def invalidate(self):
+        self._refresh_key = None
+
+    # plan parameters and dates every Call.update() depends on
+    def _get_refresh_key(self) -> tuple:
+        params = tuple((k, v) for k, v in vars(self._plan).items()
+                       if type(v) in (int, float, str, bool, date))
+        return (params, id(self._plan.strategy), self._plan.readings_version(),
+                self._plan.SYSTEM.today(), self._plan.SYSTEM.reference_date())
+
+    @_synchronized
+    def get_call(self, call_num: int) -> Call:
+        return self._call_of_num(call_num)
+
+    # Moves the calls into a columnar CallTable which becomes self.calls: a sequence
+    # of CallRow views made on demand, new calls are copied into it. Calls taken
+    # from the schedule before are not part of it any more.
+    @_synchronized
+    def compact_calls(self):
+        dirty = [i for i, c in enumerate(self.calls) if c in self._dirty]
+        self.calls = CallTable.from_calls(self._plan, self.calls)
+        self._dirty = {self.calls[i]: None for i in dirty}
+        self._reindex_calls()
+
+    # db can be a ScheduleStore or the file name of a JSON schedule table,
+    # defaults to the store of the scheduler
+    def _get_store(self, db=None) -> ScheduleStore:
+        if db is None:
+            return self.store
+        elif isinstance(db, ScheduleStore):
+            return db
+        else:
+            return JsonScheduleStore(db)
+
+    @_synchronized
+    def load_from_DB(self, db=None):
+        store = self._get_store(db)
+        loaded_only = len(self.calls) == 0
+        call_list = store.load_plan(self._plan.plan_num)
+        for row in decode_call_rows(call_list):
+            _call = self.call_factory.get_call(self._plan, row)
+            # set prev call
+            _call.prev_call = self._call_of_num(_call.prev_call_num)
+            self._add_call(_call)
+        if store is self.store and loaded_only:  # the calls are as stored
+            self._persisted = CallNumberSet(row[0] for row in call_list)
+            self._changed = {}
+        else:
+            self._persisted = None
 
+    # returns the error by call_num of the calls whose call object is not created
+    @_synchronized
+    def create_call_objects(self) -> dict:
+        if self.sink is None:
+            for c in self.calls:
+                if c.status == SS_SAVE_TO_CALL:
+                    c.create_call_object()  # create WO/NO here
+                    c.status = SS_CALLED
+                    self._changed[c.call_num] = None
+            return {}
+        # calls without acknowledged call object stay to be called
+        pending = [c for c in self.calls if c.status == SS_SAVE_TO_CALL]
+        acknowledged, errors = self.sink.submit(self._plan, pending)
+        for c in acknowledged:
+            c.status = SS_CALLED
+            self._changed[c.call_num] = None
+        return errors
+
+    # only released calls and the calls inside the window are saved
+    def _saved_call(self, c: Call, end_date: date) -> bool:
+        return end_date is None or c.status != SS_HOLD or c.planned_date <= end_date
+
+    # Saves the whole plan the first time and to another db, else only the calls
+    # changed since the last save or load: upserts of the changed calls and
+    # deletes of the removed ones.
+    @_synchronized
+    def save_to_DB(self, db=None):
+        self.create_call_objects()
+        store = self._get_store(db)
+        end_date = None if self.window_days is None else self._window_end_date()
+        if store is self.store and self._persisted is not None:
+            self._save_delta(end_date)
+        else:
+            saved = [c for c in self.calls if self._saved_call(c, end_date)]
+            store.save_plan(self._plan.plan_num, encode_call_rows(saved))
+            if store is self.store:
+                self._persisted = CallNumberSet(c.call_num for c in saved)
+                # calls outside the window are saved once they are inside
+                self._changed = {c.call_num: None for c in self.calls
+                                 if not self._saved_call(c, end_date)}
+        self.update_workload()
+
+    def _save_delta(self, end_date: date):
+        upserts, deletes, unsaved = [], [], {}
+        for num in self._changed:
+            c = self._call_of_num(num)
+            if c is not None and self._saved_call(c, end_date):
+                upserts.append(c)
+                self._persisted.add(num)
+                continue
+            if c is not None:
+                unsaved[num] = None
+            if num in self._persisted:
+                deletes.append(num)
+                self._persisted.discard(num)
+        if upserts or deletes:
+            self.store.apply_delta(self._plan.plan_num, encode_call_rows(upserts), deletes)
+        self._changed = unsaved
+
+    def update_workload(self):
+        if self.workload is not None:
+            self.workload.update_calls(self._plan.plan_num, self.calls, self._plan.work_center)
+
+    # calls are created up to the scheduling end date, or to the end of the
+    # window if it ends earlier
+    def _window_end_date(self) -> date:
+        end_date = self._plan.scheduling_end_date()
+        if self.window_days is not None:
+            end_date = min(end_date, self._plan.SYSTEM.today() + timedelta(days=self.window_days))
+        return end_date
+
+    # Lazily generated calls following last_call (default: the last scheduled call,
+    # or a new first call without calls) up to end_date, endless without end_date.
+    # The calls are not added to the schedule and not changed once yielded. Each
+    # one is made from an unlinked copy of the call before, so the generator runs
+    # in constant memory however long the calls are kept.
+    def iter_future_calls(self, end_date: date = None, last_call: Call = None):
+        if last_call is None:
+            last_call = self.get_last_scheduled_call()
+        if last_call is None:
+            last_call = self.call_factory.get_call(self._plan, data=None)
+            if end_date is not None and last_call.planned_date > end_date:
+                return
+            yield last_call
+        prev_call = last_call
+        while True:
+            next_call = self.call_factory.get_call(self._plan, prev_call)
+            if end_date is not None and next_call.planned_date > end_date:
+                return
+            yield next_call
+            prev_call = copy.copy(next_call)
+            prev_call.prev_call = None
+
+    @_synchronized
     def start_scheduling(self, start_date: date):
         self._plan.start_date = start_date
-        self.calls = []
+        self._set_calls([])
+        self._persisted = None  # the new schedule replaces the stored one
 
         first_call = self.call_factory.get_call(self._plan, data=None)
-        self.calls.append(first_call)
-        self.create_following_calls(first_call, self._plan.scheduling_end_date())
+        self._add_call(first_call)
+        self.create_following_calls(first_call, self._window_end_date())
 
+    @_synchronized
     def create_following_calls(self, last_call: Call, end_date: date):
         if last_call.planned_date < end_date:
             prev_call = last_call
@@ -814,7 +2925,7 @@ class Scheduler:
                 #     return
                 next_call = self.call_factory.get_call(self._plan, prev_call)
                 if next_call.planned_date <= end_date:
-                    self.calls.append(next_call)
+                    self._add_call(next_call)
                 else:
                     del next_call
                     break
@@ -830,43 +2941,91 @@ class Scheduler:
     def cancel_scheduling(self, start_date: date, del_waiting_calls=True):
         pass
 
+    @_synchronized
     def refresh_calls(self):
         # no adding calls even if updated plan param requires
+        key = self._get_refresh_key()
+        if key != self._refresh_key:
+            self._refresh_all_calls()
+            self._refresh_key = key
+        else:
+            self._refresh_dirty_calls()
+        self._dirty = {}
+        self.update_workload()
+
+    def _refresh_all_calls(self):
         end_date = self._plan.scheduling_end_date()
         tmp_list = []
         for c in self.calls:
+            before = self._call_state(c)
             c.update()
             if c.planned_date <= end_date or c.status != SS_HOLD:
                 tmp_list.append(c)
+                if self._call_state(c) == before:
+                    continue
+            self._changed[c.call_num] = None  # changed or pruned
+
+        if len(tmp_list) != len(self.calls):
+            self._set_calls(tmp_list)
 
-        self.calls = tmp_list
+    # updates the dirty calls in call_num order (predecessors first) and goes on
+    # with the successors of the calls whose dates or status changed
+    def _refresh_dirty_calls(self):
+        end_date = self._plan.scheduling_end_date()
+        heap = [(c.call_num, i, c) for i, c in enumerate(self._dirty)]
+        heapq.heapify(heap)
+        queued = set(self._dirty)
+        seq = len(heap)
+        pruned = set()
+        while heap:
+            c = heapq.heappop(heap)[2]
+            before = self._call_state(c)
+            c.update()
+            if c.planned_date > end_date and c.status == SS_HOLD:
+                pruned.add(c)
+                self._changed[c.call_num] = None
+            if self._call_state(c) == before:
+                continue
+            self._changed[c.call_num] = None
+            for n in self._successors_of(c):
+                if n not in queued:
+                    queued.add(n)
+                    heapq.heappush(heap, (n.call_num, seq, n))
+                    seq += 1
+
+        if pruned:
+            self._set_calls([c for c in self.calls if c not in pruned])
 
     # SAP rules:
     # if shedule_period is 0:
     #       when "update scheduling" or "rescheduling" in IP30, a new "Hold" call will be created
     #       if no waiting (Hold or Fixed) call exists, even if planned date exceeds today()
+    @_synchronized
     def update_scheduling(self):
         self.refresh_calls()
         # adding calls if updated plan param requires
         last_scheduled_call = self.get_last_scheduled_call()
         if last_scheduled_call is not None:
             if (self._plan.schedule_period > 0 and
-               last_scheduled_call.planned_date < self._plan.scheduling_end_date()):
-                self.create_following_calls(last_scheduled_call, self._plan.scheduling_end_date())
+               last_scheduled_call.planned_date < self._window_end_date()):
+                self.create_following_calls(last_scheduled_call, self._window_end_date())
             elif last_scheduled_call.status not in [SS_HOLD, SS_FIXED]:
                 # always create a new HOLD call
                 new_call = self.call_factory.get_call(self._plan, last_scheduled_call)
-                self.calls.append(new_call)
+                self._add_call(new_call)
+            self.update_workload()
         else:
             raise ValueError('Error: in update_scheduling(self)')
 
+    @_synchronized
     def manual_call(self, sc: Call, plan_date: date):
-        data = [self.get_next_manual_call_num(), plan_date.strftime(YYYYMMDD),
-                plan_date.strftime(YYYYMMDD), '',  sc.start_date.strftime(YYYYMMDD),
+        data = [self.get_next_manual_call_num(), date2Str(plan_date),
+                date2Str(plan_date), '',  date2Str(sc.start_date),
                 '', sc.prev_call_num, ST_MANUAL, SS_SAVE_TO_CALL, sc.due_package]
         new_call = self.call_factory.get_call(self._plan, data=data)
-        self.calls.append(new_call)
+        self._add_call(new_call)
 
+    @_synchronized
     def release_call(self, sc: Call) -> bool:
         pc = sc.prev_call
         if pc is not None and (pc.status not in [SS_HOLD, SS_FIXED]):
@@ -874,8 +3033,10 @@ class Scheduler:
             return False
         else:
             sc.release()
+            self.mark_dirty(sc)
             return True
 
+    @_synchronized
     def complete_call(self, sc: Call, comp_date: date) -> bool:
         pc = sc.prev_call
         if sc.status != SS_CALLED:
@@ -886,10 +3047,12 @@ class Scheduler:
             return False
         else:
             sc.complete(comp_date)
+            self.mark_dirty(sc, successors=True)
             # SAP rule: after completing a call, automatically call "update scheduling"
             self.update_scheduling()
             return True
 
+    @_synchronized
     def skip_call(self, sc: Call) -> bool:
         pc = sc.prev_call
         if pc is not None and pc.status in [SS_HOLD, SS_FIXED]:
@@ -897,8 +3060,10 @@ class Scheduler:
             return False
         else:
             sc.skip()
+            self.mark_dirty(sc, successors=True)
             return True
 
+    @_synchronized
     def fix_call(self, sc: Call, fix_date: date, next_call: Call) -> bool:
         pc = sc.prev_call
         if next_call is None:
@@ -912,62 +3077,780 @@ class Scheduler:
         else:
             if fix_date > pc.planned_date and fix_date < next_plan_date:
                 sc.fix(fix_date)
+                self.mark_dirty(sc, successors=True)
                 return True
             else:
                 print('Error: Invalid date to fix')
                 return False
 
+    @_synchronized
     def get_last_scheduled_call(self) -> Call:
-        call_nums = []
-        for s in self.calls:
-            if s.scheduling_type != ST_MANUAL:
-                call_nums.append(s.call_num)
-
-        if len(call_nums) == 0:
+        if self._last_scheduled_num is None:
             return None
-        else:
-            max_num = max(call_nums)
-            for s in self.calls:
-                if s.call_num == max_num:
-                    return s
+        return self._call_of_num(self._last_scheduled_num)
 
+    @_synchronized
     def get_next_manual_call_num(self) -> int:
         MANUAL_CALL_NUM_START = 90000000
-        maxnum = MANUAL_CALL_NUM_START
-        nums = []
-        for sch in self.calls:
-            if sch.scheduling_type == ST_MANUAL:
-                nums.append(sch.call_num)
-
-        if len(nums) > 0:
-            maxnum = max(nums) + 1
-
-        return maxnum
+        if self._last_manual_num is None:
+            return MANUAL_CALL_NUM_START
+        return self._last_manual_num + 1
 
+    @_synchronized
     def get_call_list(self) -> list:
-        data = []
+        return encode_call_rows(self.calls)
+
+    # last scheduled call numbered below n, completion shifts are included in its
+    # planned date
+    def _anchor_call(self, n: int) -> Call:
+        last = self.get_last_scheduled_call()
+        if last is not None and last.call_num < n:
+            return last
+        anchor = None
         for c in self.calls:
-            datarow = c.get_call_in_list()
-            data.append(datarow)
-        return data
+            if c.scheduling_type != ST_MANUAL and c.call_num < n and \
+               (anchor is None or c.call_num > anchor.call_num):
+                anchor = c
+        return anchor
+
+    # Planned date of call n, scheduled or not. Calls after the anchor call have no
+    # completion shifts: jump-ahead where the plan supports it, else stepping from
+    # the anchor call.
+    @_synchronized
+    def planned_date_of_call(self, n: int) -> date:
+        c = self.get_call(n)
+        if c is not None and c.scheduling_type != ST_MANUAL:
+            return c.planned_date
+        anchor = self._anchor_call(n)
+        if self._plan.supports_jump_ahead():
+            if anchor is None:
+                return self._plan.planned_date_of_call(n)
+            return self._plan.planned_date_of_call(n - anchor.call_num + 1, anchor.planned_date)
+        if anchor is None:
+            anchor = self.call_factory.get_call(self._plan, data=None)
+            if n == 1:
+                return anchor.planned_date
+        for c in self.iter_future_calls(last_call=anchor):
+            if c.call_num >= n:
+                return c.planned_date
+
+    # number of the last call planned on or before d, 0 before the first call. Like
+    # planned_date_of_call(), dates before the last scheduled call are looked up in
+    # the scheduled calls and only later ones are stepped to past it.
+    @_synchronized
+    def call_index_of_date(self, d: date) -> int:
+        anchor = self.get_last_scheduled_call()
+        if anchor is not None and anchor.planned_date > d:
+            scheduled = sorted((c for c in self.calls if c.scheduling_type != ST_MANUAL),
+                               key=lambda c: c.call_num)
+            i = bisect.bisect_right([c.planned_date for c in scheduled], d)
+            if i > 0:
+                return scheduled[i - 1].call_num
+            # before the scheduled calls, counted from the plan start
+            return min(self._call_index_after(None, d), scheduled[0].call_num - 1)
+        return self._call_index_after(anchor, d)
+
+    # call number of d stepped from the anchor call, or from the plan start
+    def _call_index_after(self, anchor: Call, d: date) -> int:
+        if self._plan.supports_jump_ahead():
+            if anchor is None:
+                return self._plan.call_index_of_date(d)
+            return anchor.call_num + self._plan.call_index_of_date(d, anchor.planned_date) - 1
+        if anchor is None:
+            anchor = self.call_factory.get_call(self._plan, data=None)
+            if anchor.planned_date > d:
+                return 0
+        n = anchor.call_num
+        for c in self.iter_future_calls(last_call=anchor):
+            if c.planned_date > d:
+                break
+            n = c.call_num
+        return n
 
 
 class SingleCycleScheduler(Scheduler):
-    def __init__(self, p: MaintenancePlan, call_obj_interval=0):
+    def __init__(self, p: MaintenancePlan, call_obj_interval=0, store: ScheduleStore = None,
+                 sink: CallObjectSink = None, window_days=None, clock: Clock = None):
         self.call_factory = SingleCycleCallFactory()
-        super().__init__(p, call_obj_interval)
+        super().__init__(p, call_obj_interval, store, sink, window_days, clock)
 
 
 class StrategyScheduler(Scheduler):
-    def __init__(self, p: StrategyPlan, call_obj_interval=0):
+    def __init__(self, p: StrategyPlan, call_obj_interval=0, store: ScheduleStore = None,
+                 sink: CallObjectSink = None, window_days=None, clock: Clock = None):
         self.call_factory = StrategyCallFactory()
-        super().__init__(p, call_obj_interval)
+        super().__init__(p, call_obj_interval, store, sink, window_days, clock)
 
     def start_in_cycle(self, start_date: date, start_offset=0):
         self._plan.start_offset = start_offset
-        super().start_call(start_date)    
-        
-        
+        super().start_call(start_date)
+
+
+def is_counter_plan(plan_params: dict) -> bool:
+    return plan_params['scheduling_indicator'] in (SI_COUNTER_BASED, SI_MULTI_COUNTER)
+
+
+# measuring documents for the counter plans among definitions, None if there is none
+def load_measuring_documents(definitions: list, filename=TABLE_MEASURING_DOC):
+    if any(is_counter_plan(d['plan']) for d in definitions):
+        return MeasuringDocuments(filename)
+    return None
+
+
+# Plan definition: {'plan': plan_params, 'strategy': {'head': head_data,
+# 'packages': pckg_data}}, strategy only for strategy plans. Counter plans use
+# documents, which are read from the measuring document table if not given.
+def build_scheduler(definition: dict, store: ScheduleStore = None,
+                    call_obj_interval=0, documents: MeasuringDocuments = None) -> Scheduler:
+    strategy = definition.get('strategy')
+    if strategy is None:
+        if is_counter_plan(definition['plan']):
+            if documents is None:
+                documents = MeasuringDocuments(TABLE_MEASURING_DOC)
+            p = CounterPlan(definition['plan'], documents)
+        else:
+            p = MaintenancePlan(definition['plan'])
+        return SingleCycleScheduler(p, call_obj_interval, store)
+    ms = SchedulingRegistry.get_instance().intern_strategy(strategy['head'], strategy['packages'])
+    return StrategyScheduler(StrategyPlan(definition['plan'], ms), call_obj_interval, store)
+
+
+# update scheduling of one shard of plans in a worker process, returns the call
+# lists and the failed plans; nothing is written and no call object is created
+def _monitor_shard(definitions: list, store: ScheduleStore, call_obj_interval=0,
+                   today: date = None, reference_date: date = None):
+    if today is not None:  # the dates of the parent process, whatever the start method
+        clock = System.get_instance()
+        clock.set_today(today)
+        clock.set_reference_date(reference_date)
+    plan_nums = [d['plan']['plan_num'] for d in definitions]
+    shard_store = MemoryScheduleStore(store.load_plans(plan_nums))
+    documents = load_measuring_documents(definitions)
+    results = {}
+    failures = {}
+    for definition in definitions:
+        plan_num = definition['plan']['plan_num']
+        try:
+            s = build_scheduler(definition, shard_store, call_obj_interval, documents)
+            s.update_scheduling()
+            results[plan_num] = s.get_call_list()
+        except Exception as e:
+            failures[plan_num] = f'{type(e).__name__}: {e}'
+    return results, failures
+
+
+# Deadline monitoring (update scheduling and call release) for many plans. Plans are
+# scheduled in shards across a process pool (mp_context as for ProcessPoolExecutor)
+# on the current and reference date of this process, which then creates the call
+# objects and writes the store once, so a JSON store is rewritten only once.
+# Returns the saved call lists and the error of each failed plan by plan_num.
+def run_deadline_monitoring(definitions: list, store: ScheduleStore = None, workers=None,
+                            shard_size=None, call_obj_interval=0, mp_context=None):
+    if store is None:
+        store = JsonScheduleStore(TABLE_SCHEDULE)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(1, math.ceil(len(definitions) / (workers * 4)))
+
+    clock = System.get_instance(call_obj_interval)
+    today, reference_date = clock.today(), clock.reference_date()
+    results = {}
+    failures = {}
+    shards = [definitions[i:i + shard_size] for i in range(0, len(definitions), shard_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        futures = {pool.submit(_monitor_shard, shard, store, call_obj_interval, today,
+                               reference_date): shard
+                   for shard in shards}
+        for future in as_completed(futures):
+            try:
+                shard_results, shard_failures = future.result()
+            except Exception as e:
+                for d in futures[future]:
+                    failures[d['plan']['plan_num']] = f'{type(e).__name__}: {e}'
+                continue
+            results.update(shard_results)
+            failures.update(shard_failures)
+
+    by_num = {d['plan']['plan_num']: d for d in definitions}
+    to_call = [plan_num for plan_num, rows in results.items()
+               if any(r[8] == SS_SAVE_TO_CALL for r in rows)]
+    documents = load_measuring_documents([by_num[plan_num] for plan_num in to_call])
+    for plan_num in to_call:
+        try:
+            rows = results[plan_num]
+            s = build_scheduler(by_num[plan_num], MemoryScheduleStore({plan_num: rows}),
+                                call_obj_interval, documents)
+            s.create_call_objects()
+            results[plan_num] = s.get_call_list()
+        except Exception as e:
+            failures[plan_num] = f'{type(e).__name__}: {e}'
+            del results[plan_num]
+    if len(results) > 0:
+        store.save_plans(results)
+
+    return results, failures
+
+
+# Event driven deadline monitoring: Hold calls are kept in a heap by the day their
+# call horizon is crossed, one heap per clock of the schedulers. run() sleeps until
+# the next crossing and releases only the calls due then. on_release(scheduler,
+# calls) is called with the released calls of each scheduler, e.g. to create the
+# call objects and save the plan. Schedulers changed by other code are re-read
+# with watch().
+class DeadlineMonitor:
+    def __init__(self, schedulers: list = (), on_release=None):
+        self.on_release = on_release
+        self._heaps = {}
+        self._watched = {}  # (scheduler, call_num): (seq, planned_date) of the live entry
+        self._seq = 0
+        self._wakeup = None
+        self._stopped = False
+        for s in schedulers:
+            self.watch(s)
+
+    def __len__(self):
+        return len(self._watched)
+
+    # first current date on which the call horizon of a call planned on planned_date
+    # is expired
+    @staticmethod
+    def horizon_crossing(mplan: MaintenancePlan, planned_date: date) -> date:
+        d = mplan.call_date_by_horizon(planned_date)
+        while not mplan.call_horizon_expired(planned_date, d):
+            d += timedelta(days=1)
+        while mplan.call_horizon_expired(planned_date, d - timedelta(days=1)):
+            d -= timedelta(days=1)
+        interval = mplan.SYSTEM.reference_date() - mplan.SYSTEM.today()
+        return d - interval
+
+    def _push(self, s: Scheduler, c: Call):
+        key = (s, c.call_num)
+        watched = self._watched.get(key)
+        if watched is not None and watched[1] == c.planned_date:
+            return
+        crossing = self.horizon_crossing(s._plan, c.planned_date)
+        heap = self._heaps.setdefault(s._plan.SYSTEM, [])
+        heapq.heappush(heap, (crossing, self._seq, s, c.call_num))
+        self._watched[key] = (self._seq, c.planned_date)
+        self._seq += 1
+
+    def watch(self, s: Scheduler):
+        with s._lock:
+            for c in s.calls:
+                if c.status == SS_HOLD and c.scheduling_type != ST_MANUAL:
+                    self._push(s, c)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def next_crossing(self) -> date:
+        crossings = [heap[0][0] for heap in self._heaps.values() if heap]
+        return min(crossings) if crossings else None
+
+    # releases the calls whose horizon is crossed on or before today, by default the
+    # current date of the clock of each scheduler, returns the released calls by
+    # scheduler
+    def release_due(self, today: date = None) -> dict:
+        released = {}
+        for clock, heap in self._heaps.items():
+            day = clock.today() if today is None else today
+            while heap and heap[0][0] <= day:
+                crossing, seq, s, call_num = heapq.heappop(heap)
+                key = (s, call_num)
+                if self._watched.get(key, (None,))[0] != seq:
+                    continue  # replaced by a later entry
+                planned_date = self._watched.pop(key)[1]
+                with s._lock:
+                    c = s.get_call(call_num)
+                    if c is None or c.status != SS_HOLD:
+                        continue  # released, completed or removed meanwhile
+                    if c.planned_date != planned_date:
+                        self._push(s, c)
+                        continue
+                    c.call_date = c.get_call_date(c.planned_date, day)
+                    c.status = c.get_status(c.planned_date, day)
+                    s.mark_dirty(c)
+                if c.status == SS_SAVE_TO_CALL:
+                    released.setdefault(s, []).append(c)
+                # still on hold: waits for the previous call, watch() again after completion
+        if self.on_release is not None:
+            for s, calls in released.items():
+                self.on_release(s, calls)
+        return released
+
+    # seconds until the start of the next crossing day on the clock it belongs to
+    def _seconds_to_next_crossing(self) -> float:
+        now = datetime.now().time()
+        seconds = [(datetime.combine(heap[0][0], datetime.min.time()) -
+                    datetime.combine(clock.today(), now)).total_seconds()
+                   for clock, heap in self._heaps.items() if heap]
+        return max(0.0, min(seconds)) if seconds else None
+
+    def stop(self):
+        self._stopped = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        try:
+            while not self._stopped:
+                self.release_due()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._seconds_to_next_crossing())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wakeup = None
+
+
+# Planned and call dates of many plans as produced by start_scheduling(), calls
+# of a plan are contiguous and ordered by call number.
+class PlanForecast:
+    def __init__(self, plan_nums: list, plan_index, call_num, planned_date, call_date, released):
+        self.plan_nums = plan_nums
+        self.plan_index = plan_index
+        self.call_num = call_num
+        self.planned_date = planned_date
+        self.call_date = call_date
+        self.released = released
+        self._positions = {num: i for i, num in enumerate(plan_nums)}
+
+    def __len__(self):
+        return len(self.call_num)
+
+    def _plan_slice(self, plan_num) -> slice:
+        i = self._positions[plan_num]
+        return slice(numpy.searchsorted(self.plan_index, i, 'left'),
+                     numpy.searchsorted(self.plan_index, i, 'right'))
+
+    def planned_dates(self, plan_num):
+        return self.planned_date[self._plan_slice(plan_num)]
+
+    def call_dates(self, plan_num):
+        return self.call_date[self._plan_slice(plan_num)]
+
+    def statuses(self):
+        return numpy.where(self.released, SS_SAVE_TO_CALL, SS_HOLD)
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        return pandas.DataFrame({
+            'plan_num': numpy.asarray(self.plan_nums, dtype=object)[self.plan_index],
+            'call_num': self.call_num,
+            'planned_date': self.planned_date,
+            'call_date': self.call_date,
+            'status': self.statuses()})
+
+
+# Vectorized equivalent of SingleCycleScheduler.start_scheduling() for SI_TIME and
+# SI_KEY_DATE plans without completion history. end_date defaults to each plan's
+# scheduling_end_date(). today and reference_date default to those of clock, the
+# System clock unless given; the reference date keeps the clock's call object
+# interval to today.
+def forecast_plans(plan_params: list, end_date: date = None, reference_date: date = None,
+                   today: date = None, clock: Clock = None) -> PlanForecast:
+    if clock is None:
+        clock = System.get_instance()
+    if today is None:
+        today = clock.today()
+    if reference_date is None:
+        reference_date = today + (clock.reference_date() - clock.today())
+
+    n = len(plan_params)
+    plan_nums = []
+    cycle = numpy.empty(n, dtype=numpy.float64)
+    horizon = numpy.empty(n, dtype=numpy.float64)
+    step_days = numpy.zeros(n, dtype=numpy.int64)
+    step_months = numpy.zeros(n, dtype=numpy.int64)
+    key_date = numpy.zeros(n, dtype=bool)
+    completion_req = numpy.zeros(n, dtype=bool)
+    first = numpy.empty(n, dtype='datetime64[D]')
+    end = numpy.empty(n, dtype='datetime64[D]')
+
+    for i, pp in enumerate(plan_params):
+        si = pp['scheduling_indicator']
+        if si not in (SI_TIME, SI_KEY_DATE):
+            raise ValueError(f"Error: scheduling indicator {si} is not supported by forecast")
+
+        c = pp['cycle_change_factor'] * period2days(pp['cycle'], pp['cycle_unit'])
+        if si == SI_TIME:
+            step_days[i] = math.floor(c)
+        else:
+            key_date[i] = True
+            step_months[i] = c // 30
+        if step_days[i] <= 0 and step_months[i] <= 0:
+            raise ValueError(f"Error: plan {pp['plan_num']} has no positive cycle")
+
+        start = numpy.datetime64(str2Date(pp['start_date']), 'D')
+        if pp['offset'] != 0:
+            offset = pp['cycle_change_factor'] * period2days(pp['offset'], pp['cycle_unit'])
+            first[i] = start + math.floor(offset)
+        elif si == SI_TIME:
+            first[i] = start + step_days[i]
+        else:
+            first[i] = _add_months_to_days(start, step_months[i])
+
+        if end_date is None:
+            sp = period2days(pp['schedule_period'], pp['sp_unit'])
+            end[i] = numpy.datetime64(today, 'D') + math.floor(sp)
+        else:
+            end[i] = numpy.datetime64(end_date, 'D')
+
+        plan_nums.append(pp['plan_num'])
+        cycle[i] = c
+        horizon[i] = pp['call_horizon']
+        completion_req[i] = pp['completion_requirement']
+
+    # step all plans forward together, dropping plans once they pass their end date
+    index_cols = [numpy.arange(n)]
+    num_cols = [numpy.ones(n, dtype=numpy.int64)]
+    date_cols = [first]
+    active = numpy.nonzero(first < end)[0]
+    current = first[active]
+    k = 1
+    while active.size > 0:
+        k += 1
+        nxt = current + step_days[active]
+        kd = key_date[active]
+        if kd.any():
+            nxt[kd] = _add_months_to_days(current[kd], step_months[active][kd])
+        keep = nxt <= end[active]
+        active = active[keep]
+        current = nxt[keep]
+        index_cols.append(active)
+        num_cols.append(numpy.full(active.size, k, dtype=numpy.int64))
+        date_cols.append(current)
+
+    plan_index = numpy.concatenate(index_cols)
+    call_num = numpy.concatenate(num_cols)
+    planned = numpy.concatenate(date_cols)
+    order = numpy.lexsort((call_num, plan_index))
+    plan_index = plan_index[order]
+    call_num = call_num[order]
+    planned = planned[order]
+
+    # Call.get_call_date() / Call.get_status() with the same float arithmetic
+    c = cycle[plan_index]
+    h = horizon[plan_index]
+    by_horizon = planned - numpy.floor(c).astype(numpy.int64) + \
+        numpy.floor(c * h / 100).astype(numpy.int64)
+    to_deadline = (planned - numpy.datetime64(reference_date, 'D')).astype(numpy.int64)
+    expired = (to_deadline / c) <= ((100 - h) / 100)
+    released = expired & ((call_num == 1) | ~completion_req[plan_index])
+    call_dates = numpy.where(released, numpy.datetime64(today, 'D'), by_horizon)
+
+    return PlanForecast(plan_nums, plan_index, call_num, planned, call_dates, released)
+
+
+# Completion delays in days, sampled as int arrays: 'normal' (mean, std),
+# 'uniform' (low, high), 'empirical' (values drawn with replacement)
+class DelayDistribution:
+    def __init__(self, kind='normal', **params):
+        if kind not in ('normal', 'uniform', 'empirical'):
+            raise ValueError(f'Error: unknown delay distribution {kind}')
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: numpy.random.Generator, size: int):
+        if self.kind == 'normal':
+            d = rng.normal(self.params.get('mean', 0), self.params.get('std', 1), size)
+        elif self.kind == 'uniform':
+            d = rng.uniform(self.params['low'], self.params['high'], size)
+        else:
+            d = rng.choice(numpy.asarray(self.params['values']), size)
+        return numpy.rint(d).astype(numpy.int64)
+
+
+# Percentiles per plan of the simulated trajectories: drift in days of the planned
+# date of the last nominal call of the horizon, calls planned in the horizon and
+# calls planned per simulated year
+class SimulationResult:
+    def __init__(self, plan_nums: list, percentiles, drift, calls, calls_per_year):
+        self.plan_nums = plan_nums
+        self.percentiles = percentiles
+        self.drift = drift
+        self.calls = calls
+        self.calls_per_year = calls_per_year
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        rows = []
+        for i, plan_num in enumerate(self.plan_nums):
+            for j, q in enumerate(self.percentiles):
+                row = {'plan_num': plan_num, 'percentile': q,
+                       'drift_days': self.drift[i, j], 'calls': self.calls[i, j]}
+                for y in range(self.calls_per_year.shape[1]):
+                    row[f'calls_year_{y + 1}'] = self.calls_per_year[i, y, j]
+                rows.append(row)
+        return pandas.DataFrame(rows)
+
+
+# Trajectories of one SI_TIME or SI_KEY_DATE plan, all runs stepped together with
+# the rules of Call.update(), tolerance_exceeded() and shifting_days(): every call
+# is completed delay days after its planned date, the clock is simulated.
+def _simulate_plan(pp: dict, delays: DelayDistribution, years: int, runs: int,
+                   seed, percentiles):
+    si = pp['scheduling_indicator']
+    if si not in (SI_TIME, SI_KEY_DATE):
+        raise ValueError(f"Error: scheduling indicator {si} is not supported by simulation")
+    rng = numpy.random.default_rng(seed)
+    c = pp['cycle_change_factor'] * period2days(pp['cycle'], pp['cycle_unit'])
+    step_days = math.floor(c) if si == SI_TIME else 0
+    step_months = 0 if si == SI_TIME else c // 30
+    if step_days <= 0 and step_months <= 0:
+        raise ValueError(f"Error: plan {pp['plan_num']} has no positive cycle")
+    late_tol = c * pp['SF_late_tolerance'] // 100
+    early_tol = c * pp['SF_early_tolerance'] // 100
+    sf_late = pp['SF_late']
+    sf_early = pp['SF_early']
+    completion_req = pp['completion_requirement']
+
+    def step(d):
+        if step_months > 0:
+            return _add_months_to_days(d, step_months)
+        return d + step_days
+
+    start = numpy.datetime64(str2Date(pp['start_date']), 'D')
+    if pp['offset'] != 0:
+        first = start + math.floor(pp['cycle_change_factor'] *
+                                   period2days(pp['offset'], pp['cycle_unit']))
+    else:
+        first = step(numpy.array([start]))[0]
+    end = _add_months_to_days(numpy.array([start]), 12 * years)[0]
+
+    year_starts = _add_months_to_days(numpy.full(years + 1, start), 12 * numpy.arange(years + 1))
+    planned = numpy.full(runs, first)
+    nominal = first
+    calls = numpy.zeros(runs, dtype=numpy.int64)
+    calls_per_year = numpy.zeros((runs, years), dtype=numpy.int64)
+    drift = numpy.zeros(runs, dtype=numpy.int64)
+    alive = planned <= end
+    while alive.any() or nominal <= end:
+        calls += alive
+        year = numpy.clip(numpy.searchsorted(year_starts, planned, 'right') - 1, 0, years - 1)
+        numpy.add.at(calls_per_year, (numpy.nonzero(alive)[0], year[alive]), 1)
+        if nominal <= end:
+            drift = (planned - nominal).astype(numpy.int64)
+
+        delta = delays.sample(rng, runs)
+        completion = planned + delta
+        exceeded = numpy.where(delta > 0, late_tol < delta, early_tol < -delta)
+        shift = numpy.where(exceeded, numpy.where(delta > 0, delta * sf_late // 100,
+                                                  delta * sf_early // 100), 0)
+        base = numpy.where(exceeded, completion, planned) if completion_req else planned
+        planned = step(base) + shift
+        nominal = step(numpy.array([nominal]))[0]
+        alive &= planned <= end
+
+    return (numpy.percentile(drift, percentiles),
+            numpy.percentile(calls, percentiles),
+            numpy.percentile(calls_per_year, percentiles, axis=0).T)
+
+
+def _simulate_shard(plans: list, delays: DelayDistribution, years: int, runs: int,
+                    percentiles):
+    return [(i, _simulate_plan(pp, delays, years, runs, seed, percentiles))
+            for i, pp, seed in plans]
+
+
+# What-if simulation of completion delays: runs trajectories per plan over years
+# from the plan start dates. overrides replaces plan parameters of every plan, e.g.
+# {'SF_late': 50, 'completion_requirement': True}. Plans are spread over a process
+# pool (workers=1 runs in this process), results are reproducible by seed.
+def simulate_plans(plan_params: list, delays: DelayDistribution, years=5, runs=10000,
+                   seed=0, overrides: dict = None, percentiles=(5, 50, 95),
+                   workers=None) -> SimulationResult:
+    if overrides:
+        plan_params = [dict(pp, **overrides) for pp in plan_params]
+    seeds = numpy.random.SeedSequence(seed).spawn(len(plan_params))
+    plans = list(zip(range(len(plan_params)), plan_params, seeds))
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    n = len(plan_params)
+    drift = numpy.zeros((n, len(percentiles)))
+    calls = numpy.zeros((n, len(percentiles)))
+    calls_per_year = numpy.zeros((n, years, len(percentiles)))
+
+    def collect(results):
+        for i, (d, c, cy) in results:
+            drift[i], calls[i], calls_per_year[i] = d, c, cy
+
+    if workers <= 1 or n <= 1:
+        collect(_simulate_shard(plans, delays, years, runs, percentiles))
+    else:
+        shard_size = max(1, math.ceil(n / (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_simulate_shard, plans[i:i + shard_size], delays, years,
+                                   runs, percentiles)
+                       for i in range(0, n, shard_size)]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    return SimulationResult([pp['plan_num'] for pp in plan_params], list(percentiles),
+                            drift, calls, calls_per_year)
+
+
+# Instrumented operations: (owner, attribute). Owners are classes or this module
+# for the JSON I/O functions; metrics are named 'Owner.attribute'.
+METRICS_TARGETS = [
+    ('Scheduler', 'load_from_DB'), ('Scheduler', 'refresh_calls'),
+    ('Scheduler', 'update_scheduling'), ('Scheduler', 'create_following_calls'),
+    ('Scheduler', 'save_to_DB'),
+    ('Call', 'update'), ('StrategyCall', 'update'), ('Call', 'get_call_date'),
+    ('MaintenancePlan', 'call_horizon_expired'), ('MaintenancePlan', 'call_date_by_horizon'),
+    ('MaintenancePlan', 'date_add_by_scheduling_indicator'),
+    ('FactoryCalendar', 'add_workdays'),
+    (None, 'read_data_in_json'), (None, 'save_data_in_json'), (None, 'read_plans_in_json')]
+# upper bounds in seconds of the timing histogram buckets, +Inf is implicit
+METRICS_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1, 5)
+
+
+class OperationMetric:
+    __slots__ = ('count', 'errors', 'seconds', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(METRICS_BUCKETS) + 1)
+
+    def to_dict(self) -> dict:
+        cumulative = []
+        n = 0
+        for b in self.buckets:
+            n += b
+            cumulative.append(n)
+        return {'count': self.count, 'errors': self.errors, 'seconds': self.seconds,
+                'buckets': dict(zip([str(b) for b in METRICS_BUCKETS] + ['+Inf'], cumulative))}
+
+
+# Call counters and timing histograms of the METRICS_TARGETS operations. The
+# operations are wrapped only while collection is enabled, so disabled metrics
+# leave the original functions in place and cost nothing.
+class Metrics:
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if Metrics._instance is None:
+            Metrics._instance = Metrics()
+        return Metrics._instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._originals = {}
+        self._enabled = 0
+        self.operations = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled > 0
+
+    def record(self, name: str, seconds: float, failed=False):
+        with self._lock:
+            m = self.operations.get(name)
+            if m is None:
+                m = self.operations[name] = OperationMetric()
+            m.count += 1
+            m.seconds += seconds
+            if failed:
+                m.errors += 1
+            m.buckets[bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1
+
+    def _timed(self, name: str, func):
+        record = self.record
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(name, perf_counter() - t, True)
+                raise
+            record(name, perf_counter() - t)
+            return result
+        return wrapper
+
+    def enable(self):
+        self._enabled += 1
+        if self._enabled > 1:
+            return
+        module = globals()
+        for owner_name, attr in METRICS_TARGETS:
+            if owner_name is None:
+                name = attr
+                func = module[attr]
+                module[attr] = self._timed(name, func)
+            else:
+                name = f'{owner_name}.{attr}'
+                owner = module[owner_name]
+                func = owner.__dict__[attr]
+                setattr(owner, attr, self._timed(name, func))
+            self._originals[(owner_name, attr)] = func
+
+    def disable(self):
+        if self._enabled == 0:
+            return
+        self._enabled -= 1
+        if self._enabled > 0:
+            return
+        module = globals()
+        for (owner_name, attr), func in self._originals.items():
+            if owner_name is None:
+                module[attr] = func
+            else:
+                setattr(module[owner_name], attr, func)
+        self._originals = {}
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: m.to_dict() for name, m in sorted(self.operations.items())}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = ['# HELP plan_alg_operation_seconds Duration of plan_alg operations.',
+                 '# TYPE plan_alg_operation_seconds histogram']
+        errors = []
+        for name, m in self.snapshot().items():
+            for le, n in m['buckets'].items():
+                lines.append(f'plan_alg_operation_seconds_bucket{{operation="{name}",le="{le}"}} {n}')
+            lines.append(f'plan_alg_operation_seconds_sum{{operation="{name}"}} {m["seconds"]}')
+            lines.append(f'plan_alg_operation_seconds_count{{operation="{name}"}} {m["count"]}')
+            errors.append(f'plan_alg_operation_errors_total{{operation="{name}"}} {m["errors"]}')
+        lines += ['# HELP plan_alg_operation_errors_total Operations ended by an exception.',
+                  '# TYPE plan_alg_operation_errors_total counter'] + errors
+        return '\n'.join(lines) + '\n'
+
+
+# Collects metrics inside the with block:
+#     with collect_metrics() as metrics:
+#         s.update_scheduling()
+#     print(metrics.to_prometheus())
+@contextlib.contextmanager
+def collect_metrics(reset=False):
+    metrics = Metrics.get_instance()
+    if reset:
+        metrics.reset()
+    metrics.enable()
+    try:
+        yield metrics
+    finally:
+        metrics.disable()
+
+
+if os.environ.get(METRICS_ENV, '') not in ('', '0'):
+    Metrics.get_instance().enable()
+
 
 class TestScheduler:
     _scheduler = None
@@ -1059,6 +3942,7 @@ class TestScheduler:
 
     def _clear_calls(self):
         self._scheduler.calls = []
+        self._scheduler._reindex_calls()
 
 
 class SchedulerBuilder:
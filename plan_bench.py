@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the scheduler operations on synthetic maintenance plans.
+
+Plans are generated in the style of the SchedulerBuilder classes of plan_alg with
+a seeded random generator, the current date is frozen to --reference-date so runs
+are reproducible offline. Results are written as JSON.
+
+    python plan_bench.py --plans 1000 --store sqlite --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from plan_alg import (SchedulerBuilder, SingleCycleScheduler, StrategyScheduler,
+                      MaintenancePlan, StrategyPlan, MaintenanceStrategy,
+                      JsonScheduleStore, SqliteScheduleStore, MemoryScheduleStore,
+                      System, str2Date, date2Str,
+                      SI_TIME, SI_KEY_DATE, SI_FACTORY_CALENDAR,
+                      SS_CALLED, SS_HOLD, SS_FIXED)
+
+BENCH_OPERATIONS = ['start_scheduling', 'save', 'load', 'refresh_calls',
+                    'update_scheduling', 'complete_call', 'save_after_complete']
+
+
+class SyntheticSchedulerBuilder(SchedulerBuilder):
+    plan_prefix = 'S'
+
+    def __init__(self, index: int, rng: random.Random, store, reference_date):
+        self.index = index
+        self.rng = rng
+        self.store = store
+        self.reference_date = reference_date
+        self._plan_data = None
+        self._start_date = None
+
+    def plan_num(self) -> str:
+        return f'{self.plan_prefix}{self.index:07d}'
+
+    # plan parameters and start date are drawn once, rebuilding a scheduler
+    # gives the same plan
+    def start_date(self):
+        if self._start_date is None:
+            self._start_date = self.reference_date - timedelta(days=self.rng.randint(0, 720))
+        return self._start_date
+
+    def plan_data(self) -> dict:
+        if self._plan_data is None:
+            self._plan_data = self.new_plan_data()
+        return dict(self._plan_data)
+
+    def new_plan_data(self) -> dict:
+        return {
+            'plan_num': self.plan_num(),
+            'cycle': self.rng.choice([1, 2, 3, 6, 12]), 'cycle_unit': 'MON',
+            'offset': 0,
+            'SF_late': 100,
+            'SF_late_tolerance': 10,
+            'SF_early': 100,
+            'SF_early_tolerance': 10,
+            'cycle_change_factor': 1,
+            'call_horizon': self.rng.choice([50, 70, 90]),
+            'schedule_period': self.rng.choice([90, 180, 365]), 'sp_unit': 'D',
+            'completion_requirement': False,
+            'start_date': date2Str(self.reference_date),
+            'scheduling_indicator': self.rng.choice([SI_TIME, SI_KEY_DATE]),
+            'factory_calendar': '00'}
+
+
+class SyntheticSingleCycleBuilder(SyntheticSchedulerBuilder):
+    plan_prefix = 'C'
+
+    def build_scheduler(self):
+        return SingleCycleScheduler(MaintenancePlan(self.plan_data()), store=self.store)
+
+
+class SyntheticZeroSchedulingPeriodBuilder(SyntheticSchedulerBuilder):
+    plan_prefix = 'Z'
+
+    def new_plan_data(self) -> dict:
+        data = super().new_plan_data()
+        data.update({'SF_late': 0, 'SF_late_tolerance': 0,
+                     'SF_early': 0, 'SF_early_tolerance': 0,
+                     'call_horizon': 0, 'schedule_period': 0,
+                     'completion_requirement': True,
+                     'scheduling_indicator': SI_TIME})
+        return data
+
+    def build_scheduler(self):
+        return SingleCycleScheduler(MaintenancePlan(self.plan_data()), store=self.store)
+
+
+class SyntheticFactoryCalendarBuilder(SyntheticSchedulerBuilder):
+    plan_prefix = 'F'
+
+    def new_plan_data(self) -> dict:
+        data = super().new_plan_data()
+        data.update({'cycle': self.rng.choice([10, 20, 30]), 'cycle_unit': 'D',
+                     'scheduling_indicator': SI_FACTORY_CALENDAR})
+        return data
+
+    def build_scheduler(self):
+        return SingleCycleScheduler(MaintenancePlan(self.plan_data()), store=self.store)
+
+
+class SyntheticStrategyBuilder(SyntheticSchedulerBuilder):
+    plan_prefix = 'P'
+    strategy_head = ["A", "Scheduling by time", 0, "MON", 0, 0, 0, 0, 0, ""]
+    package_data = [
+        [1, 2, "MON", "2-monthly", "2M", 1, "H1", 0, "", 2, 2, True],
+        [2, 3, "MON", "3-monthly", "3M", 2, "H2", 0, "", 5, 5, True],
+        [3, 5, "MON", "5-monthly", "5M", 3, "H3", 0, "", 10, 10, True]]
+    _strategy = None
+
+    def new_plan_data(self) -> dict:
+        data = super().new_plan_data()
+        data.update({'cycle': 30, 'cycle_unit': 'D', 'call_horizon': 100,
+                     'schedule_period': 12, 'sp_unit': 'MON',
+                     'scheduling_indicator': SI_KEY_DATE})
+        return data
+
+    def build_scheduler(self):
+        if SyntheticStrategyBuilder._strategy is None:
+            SyntheticStrategyBuilder._strategy = MaintenanceStrategy(self.strategy_head,
+                                                                     self.package_data)
+        _plan = StrategyPlan(self.plan_data(), SyntheticStrategyBuilder._strategy)
+        return StrategyScheduler(_plan, store=self.store)
+
+
+BENCH_KINDS = {
+    'single_cycle': SyntheticSingleCycleBuilder,
+    'zero_scheduling_period': SyntheticZeroSchedulingPeriodBuilder,
+    'strategy': SyntheticStrategyBuilder,
+    'factory_calendar': SyntheticFactoryCalendarBuilder}
+
+
+def _make_store(kind: str, workdir: str, name: str):
+    if kind == 'json':
+        path = os.path.join(workdir, name + '.json')
+        with open(path, 'w') as f:
+            f.write('{}')
+        return JsonScheduleStore(path)
+    elif kind == 'sqlite':
+        return SqliteScheduleStore(os.path.join(workdir, name + '.db'))
+    elif kind == 'memory':
+        return MemoryScheduleStore()
+    else:
+        raise ValueError(f'Error: unknown store {kind}')
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class OperationTimer:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    # func is applied to every item, schedulers are the ones holding the calls
+    # afterwards (the items themselves by default). The items failing with a
+    # ValueError are counted, the first error is raised once the result is recorded.
+    def run(self, name: str, items: list, func, schedulers: list = None):
+        if self.trace_memory:
+            tracemalloc.start()
+        errors = []
+        rss_before = _peak_rss_kb()
+        t = time.perf_counter()
+        for item in items:
+            try:
+                func(item)
+            except ValueError as e:
+                errors.append(e)
+        seconds = time.perf_counter() - t
+        rss_after = _peak_rss_kb()
+        if schedulers is None:
+            schedulers = items
+        calls = sum(len(s.calls) for s in schedulers)
+        result = {'seconds': seconds,
+                  'plans': len(items),
+                  'errors': len(errors),
+                  'calls': calls,
+                  'calls_per_sec': calls / seconds if seconds > 0 else None,
+                  # the process peak so far and how much the operation raised it
+                  'process_peak_rss_kb': rss_after,
+                  'peak_rss_growth_kb': None if rss_after is None else rss_after - rss_before}
+        if self.trace_memory:
+            result['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results[name] = result
+        if errors:
+            raise errors[0]
+
+
+def _complete_first_called(rng: random.Random):
+    def complete(s):
+        for c in s.calls:
+            pc = c.prev_call
+            if c.status == SS_CALLED and (pc is None or pc.status not in [SS_HOLD, SS_FIXED]):
+                s.complete_call(c, c.planned_date + timedelta(days=rng.randint(-5, 10)))
+                return
+    return complete
+
+
+def bench_kind(kind: str, plans: int, store_kind: str, workdir: str, reference_date,
+               seed: int, trace_memory=False) -> dict:
+    builder_class = BENCH_KINDS[kind]
+    rng = random.Random(seed)
+    store = _make_store(store_kind, workdir, kind)
+    builders = [builder_class(i, rng, store, reference_date) for i in range(plans)]
+    timer = OperationTimer(trace_memory)
+
+    schedulers = [b.build_scheduler() for b in builders]
+    starts = {b.plan_num(): b.start_date() for b in builders}
+    timer.run('start_scheduling', schedulers,
+              lambda s: s.start_scheduling(starts[s._plan.plan_num]))
+    timer.run('save', schedulers, lambda s: s.save_to_DB())
+
+    loaded = []
+    timer.run('load', builders, lambda b: loaded.append(b.build_scheduler()), loaded)
+    for s in loaded:  # loaded schedulers carry the plan start dates of the first run
+        s._plan.start_date = starts[s._plan.plan_num]
+
+    timer.run('refresh_calls', loaded, lambda s: s.refresh_calls())
+    # the refresh drops a single call planned after the scheduling end date, such
+    # plans have nothing to update
+    scheduled = [s for s in loaded if s.get_last_scheduled_call() is not None]
+    timer.run('update_scheduling', scheduled, lambda s: s.update_scheduling())
+    timer.run('complete_call', loaded, _complete_first_called(rng))
+    timer.run('save_after_complete', loaded, lambda s: s.save_to_DB())
+
+    if store_kind == 'sqlite':
+        store.close()
+    return timer.results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark scheduler operations on '
+                                                 'synthetic maintenance plans.')
+    parser.add_argument('--plans', type=int, default=200, help='plans per kind')
+    parser.add_argument('--kinds', default=','.join(BENCH_KINDS),
+                        help='comma separated plan kinds: ' + ', '.join(BENCH_KINDS))
+    parser.add_argument('--store', default='json', choices=['json', 'sqlite', 'memory'])
+    parser.add_argument('--reference-date', default='20230601',
+                        help='frozen current date, YYYYMMDD')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also report tracemalloc peaks (slows down the timings)')
+    parser.add_argument('--workdir', default=None, help='directory for the store files')
+    parser.add_argument('--output', default=None, help='JSON output file, default stdout')
+    args = parser.parse_args(argv)
+
+    reference_date = str2Date(args.reference_date)
+    System.get_instance().set_today(reference_date)
+    kinds = [k for k in args.kinds.split(',') if k]
+
+    report = {'reference_date': args.reference_date,
+              'plans_per_kind': args.plans,
+              'store': args.store,
+              'seed': args.seed,
+              'python': platform.python_version(),
+              'operations': BENCH_OPERATIONS,
+              'results': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        for kind in kinds:
+            report['results'][kind] = bench_kind(kind, args.plans, args.store, workdir,
+                                                 reference_date, args.seed, args.trace_memory)
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plan_alg import System, str2Date, SI_TIME  # noqa: E402
+
+
+# every test runs in its own directory (default stores write to the current
+# directory) with the current date frozen to 2023-06-01
+@pytest.fixture(autouse=True)
+def frozen_today(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = System.get_instance()
+    saved = clock._today, clock._interval
+    clock.set_today(str2Date('20230601'))
+    yield clock
+    clock._today, clock._interval = saved
+
+
+# plan parameters in the format of the SchedulerBuilder classes
+@pytest.fixture
+def plan_data():
+    def make(plan_num='1000001', **overrides):
+        data = {'plan_num': plan_num,
+                'cycle': 1, 'cycle_unit': 'MON',
+                'offset': 0,
+                'SF_late': 100,
+                'SF_late_tolerance': 10,
+                'SF_early': 100,
+                'SF_early_tolerance': 10,
+                'cycle_change_factor': 1,
+                'call_horizon': 70,
+                'schedule_period': 365, 'sp_unit': 'D',
+                'completion_requirement': False,
+                'start_date': '20230601',
+                'scheduling_indicator': SI_TIME,
+                'factory_calendar': '00'}
+        data.update(overrides)
+        return data
+    return make
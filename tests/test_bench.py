@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import plan_bench
+from plan_bench import BENCH_KINDS, BENCH_OPERATIONS, OperationTimer
+
+
+def test_bench_reports_every_operation(tmp_path):
+    output = tmp_path / 'bench.json'
+    plan_bench.main(['--plans', '12', '--store', 'memory', '--output', str(output),
+                     '--workdir', str(tmp_path)])
+    report = json.loads(output.read_text())
+    assert set(report['results']) == set(BENCH_KINDS)
+    for results in report['results'].values():
+        assert list(results) == BENCH_OPERATIONS
+        for result in results.values():
+            assert result['errors'] == 0
+            assert result['seconds'] >= 0
+
+
+def test_bench_is_reproducible(tmp_path):
+    reports = []
+    for i in range(2):
+        output = tmp_path / f'bench{i}.json'
+        plan_bench.main(['--plans', '8', '--kinds', 'single_cycle,strategy', '--store', 'json',
+                         '--output', str(output), '--workdir', str(tmp_path)])
+        results = json.loads(output.read_text())['results']
+        reports.append({k: {op: r['calls'] for op, r in v.items()} for k, v in results.items()})
+    assert reports[0] == reports[1]
+
+
+class Item:
+    calls = [1, 2]
+
+
+def test_timer_records_and_raises_errors():
+    timer = OperationTimer()
+
+    def fail_second(item):
+        if item is items[1]:
+            raise ValueError('Error: second')
+
+    items = [Item(), Item(), Item()]
+    with pytest.raises(ValueError, match='second'):
+        timer.run('op', items, fail_second)
+    result = timer.results['op']
+    assert result['errors'] == 1 and result['plans'] == 3 and result['calls'] == 6
+    if result['process_peak_rss_kb'] is not None:
+        assert result['peak_rss_growth_kb'] >= 0
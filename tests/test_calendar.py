@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from plan_alg import FactoryCalendar, HOLIDAYS, str2Date
+
+
+# the day by day loops of the original FactoryCalendar
+def _holiday_count(holidays, start, end):
+    return sum(1 for h in holidays if start <= h <= end)
+
+
+def _add_workdays(holidays, d, workdays):
+    cnt = wdc = 0
+    while wdc <= workdays:
+        cnt += 1
+        rd = d + timedelta(days=cnt)
+        if rd not in holidays:
+            wdc += 1
+    return rd
+
+
+def test_holiday_count_counts_listed_holidays():
+    calendar = FactoryCalendar(HOLIDAYS)
+    holidays = [str2Date(s) for s in HOLIDAYS]
+    may13 = str2Date('20230513')
+    assert calendar.holiday_count(may13, may13) == 2  # listed twice
+    start = str2Date('20230401')
+    for i in range(0, 240, 3):
+        for j in range(0, 120, 7):
+            s = start + timedelta(days=i)
+            e = s + timedelta(days=j)
+            assert calendar.holiday_count(s, e) == _holiday_count(holidays, s, e)
+    assert calendar.holiday_count(str2Date('20231231'), str2Date('20230101')) == 0
+
+
+def test_add_workdays_matches_day_by_day():
+    calendar = FactoryCalendar(HOLIDAYS)
+    holidays = set(str2Date(s) for s in HOLIDAYS)
+    start = str2Date('20230415')
+    for i in range(0, 200, 2):
+        d = start + timedelta(days=i)
+        for workdays in (0, 1, 5, 20, 45):
+            assert calendar.add_workdays(d, workdays) == _add_workdays(holidays, d, workdays)
+            assert calendar.is_workday(d) == (d not in holidays)
+
+
+def test_empty_calendar():
+    calendar = FactoryCalendar([])
+    d = str2Date('20230601')
+    assert calendar.holiday_count(d, d + timedelta(days=30)) == 0
+    assert calendar.add_workdays(d, 3) == d + timedelta(days=4)
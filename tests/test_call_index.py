@@ -0,0 +1,56 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from plan_alg import (CallDateIndex, MaintenancePlan, SingleCycleScheduler, str2Date, SS_HOLD,
+                      SS_SAVE_TO_CALL)
+from test_store import store  # noqa: F401
+
+
+def _brute_force(store, start, end, statuses, column):
+    found = []
+    for plan_num in store.plan_nums():
+        for r in store.load_plan(plan_num):
+            if r[8] in statuses and start <= str2Date(r[column]) <= end:
+                found.append((r[column], plan_num, r[0]))
+    return [(plan_num, n) for d, plan_num, n in sorted(found)]
+
+
+def test_calls_due_follow_the_saved_schedules(store, plan_data):  # noqa: F811
+    rng = random.Random(2)
+    schedulers = [SingleCycleScheduler(MaintenancePlan(plan_data(f'10{i}', cycle=9 + i,
+                                                                  cycle_unit='D')), store=store)
+                  for i in range(5)]
+    start = str2Date('20230101')
+    for s in schedulers:
+        s.start_scheduling(start)
+        s.save_to_DB()
+    for step in range(6):
+        lo = start + timedelta(days=rng.randint(0, 300))
+        hi = lo + timedelta(days=rng.randint(0, 120))
+        for kind, column in (('planned', 1), ('call', 2)):
+            for statuses in ((SS_HOLD, SS_SAVE_TO_CALL), (SS_HOLD,)):
+                due = store.calls_due(lo, hi, statuses, kind)
+                assert due == _brute_force(store, lo, hi, statuses, column)
+        s = rng.choice(schedulers)
+        c = rng.choice(s.calls)
+        s.manual_call(c, c.planned_date + timedelta(days=3))
+        s.update_scheduling()
+        s.save_to_DB()  # saved as a delta, the index follows
+
+
+def test_index_orders_by_date_and_replaces_plans():
+    index = CallDateIndex()
+    index.update_rows('P1', [[1, '20230701', '20230615', '', '', '', 0, 'T', 'Hold', ''],
+                             [2, '20230601', '20230515', '', '', '', 1, 'T', 'Hold', '']])
+    index.update_rows('P2', [[1, '20230610', '20230610', '', '', '', 0, 'T', 'Called', '']])
+    assert index.calls_due(str2Date('20230101'), str2Date('20231231')) == [('P1', 2), ('P1', 1)]
+    assert index.calls_due(str2Date('20230101'), str2Date('20231231'),
+                           statuses=('Called',), kind='call') == [('P2', 1)]
+    index.apply_delta('P1', [[2, '20230801', '20230715', '', '', '', 1, 'T', 'Hold', '']], [1])
+    assert index.calls_due(str2Date('20230101'), str2Date('20231231')) == [('P1', 2)]
+    index.update_rows('P1', [])
+    assert len(index) == 1 and index._days[(SS_HOLD, 'planned')] == []
+    with pytest.raises(ValueError):
+        index.calls_due(str2Date('20230101'), str2Date('20231231'), kind='completion')
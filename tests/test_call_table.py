@@ -0,0 +1,108 @@
+import gc
+import random
+import tracemalloc
+from datetime import timedelta
+
+import pytest
+
+from plan_alg import (CallRow, CallTable, MaintenancePlan, MemoryScheduleStore,
+                      SingleCycleScheduler, STATUS_CODES, SCHEDULING_TYPE_CODES,
+                      str2Date, SS_CALLED, SS_HOLD, _format_date, _parse_date)
+
+
+def _scheduler(plan_data, start='20220101', **overrides):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(**overrides)), store=MemoryScheduleStore())
+    s.start_scheduling(str2Date(start))
+    return s
+
+
+def _operate(s, rng, steps):
+    for _ in range(steps):
+        op = rng.random()
+        called = [c for c in s.calls if c.status == SS_CALLED]
+        if op < 0.4 and called:
+            c = called[0]
+            s.complete_call(c, c.planned_date + timedelta(days=rng.randint(-3, 9)))
+        elif op < 0.6:
+            hold = [c for c in s.calls if c.status == SS_HOLD]
+            if hold:
+                s.release_call(hold[0])
+        elif op < 0.7:
+            c = s.calls[rng.randrange(len(s.calls))]
+            s.manual_call(c, c.planned_date + timedelta(days=2))
+        else:
+            s.update_scheduling()
+        s.save_to_DB()
+
+
+def test_compacted_schedule_behaves_like_call_objects(plan_data):
+    objects = _scheduler(plan_data, cycle=9, cycle_unit='D')
+    compacted = _scheduler(plan_data, cycle=9, cycle_unit='D')
+    compacted.compact_calls()
+    assert isinstance(compacted.calls, CallTable)
+    for s in (objects, compacted):
+        _operate(s, random.Random(5), 60)
+    assert compacted.get_call_list() == objects.get_call_list()
+    assert isinstance(compacted.calls, CallTable)  # pruning keeps the table
+    assert compacted.store.load_plan('1000001') == objects.store.load_plan('1000001')
+    for c in compacted.calls:
+        assert compacted.get_call(c.call_num) == c
+        if c.prev_call is not None:
+            assert c in compacted._successors_of(c.prev_call)
+
+
+def _collect():
+    _format_date.cache_clear()
+    _parse_date.cache_clear()
+    gc.collect()
+
+
+def test_compacted_schedule_holds_no_call_objects(plan_data):
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        s = _scheduler(plan_data, start='19900101', cycle=1, cycle_unit='D')
+        s.refresh_calls()
+        s.save_to_DB()
+        s.store.plans.clear()
+        _collect()
+        objects = tracemalloc.get_traced_memory()[0] - base
+        s.compact_calls()
+        _collect()
+        compacted = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    n = len(s.calls)
+    assert n > 10000
+    assert compacted / n < 100 < objects / n / 3
+    assert not any(isinstance(v, CallRow) for v in vars(s).values())
+
+
+def test_codes_are_kept_per_table(plan_data):
+    statuses, types = list(STATUS_CODES), list(SCHEDULING_TYPE_CODES)
+    s = _scheduler(plan_data)
+    table = CallTable.from_calls(s._plan, s.calls)
+    other = CallTable.from_calls(s._plan, s.calls)
+    table[0].status = 'Custom'
+    assert table[0].status == 'Custom'
+    assert STATUS_CODES == statuses and SCHEDULING_TYPE_CODES == types
+    assert 'Custom' not in other._statuses
+    with pytest.raises(ValueError):
+        for i in range(200):
+            table[0].status = f'S{i}'
+    for i in range(1000):
+        table[0].due_package = f'P{i}'  # due packages have 16 bit codes
+    assert table[0].due_package == 'P999'
+
+
+def test_table_indexes_follow_prev_changes(plan_data):
+    s = _scheduler(plan_data)
+    table = CallTable.from_calls(s._plan, s.calls)
+    assert [r._i for r in table.successors(0)] == [1]
+    table[2].prev_call = table[0]
+    assert [r._i for r in table.successors(0)] == [1, 2]
+    assert table.successors(1) == []
+    table[2].prev_call = None
+    assert [r._i for r in table.successors(0)] == [1]
+    assert table.row_of_num(table[3].call_num) == table[3]
+    assert table.row_of_num(4711) is None
@@ -0,0 +1,63 @@
+import random
+from datetime import date, datetime
+
+from plan_alg import (CallTable, Call, MaintenancePlan, MemoryScheduleStore, NULL_DATE,
+                      SingleCycleScheduler, decode_call_rows, encode_call_rows,
+                      date2Str, str2Date, str2DateTime, YYYYMMDD, YMDHMS)
+
+
+def test_codecs_match_strptime_and_strftime():
+    rng = random.Random(9)
+    for _ in range(2000):
+        d = date.fromordinal(rng.randint(date(1000, 1, 1).toordinal(), date(9999, 12, 31).toordinal()))
+        s = d.strftime(YYYYMMDD)
+        assert date2Str(d) == s
+        assert str2Date(s) == d
+        dt = datetime(d.year, d.month, d.day, rng.randint(0, 23), rng.randint(0, 59))
+        assert str2DateTime(dt.strftime(YMDHMS)) == dt
+    assert str2Date('') == NULL_DATE and str2Date(None) == NULL_DATE
+    assert date2Str(date(999, 3, 4)) == date(999, 3, 4).strftime(YYYYMMDD)
+
+
+def _calls(plan_data):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(cycle=5, cycle_unit='D')),
+                             store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20220101'))
+    s.calls[3].complete(str2Date('20220120'))
+    s.calls[4].completion_date = None
+    return s
+
+
+def test_encode_matches_get_call_in_list(plan_data):
+    s = _calls(plan_data)
+    rows = [c.get_call_in_list() for c in s.calls]
+    assert encode_call_rows(s.calls) == rows
+    assert encode_call_rows(iter(s.calls)) == rows
+    assert encode_call_rows([]) == []
+    assert rows[0][5] == '' and rows[3][3] == '20220120' and rows[4][3] == ''
+    table = CallTable.from_calls(s._plan, s.calls)
+    assert table.get_call_list() == rows
+    assert encode_call_rows(table) == encode_call_rows(list(table)) == rows
+
+
+def test_decode_round_trips(plan_data):
+    s = _calls(plan_data)
+    rows = encode_call_rows(s.calls)
+    decoded = decode_call_rows(rows)
+    assert decoded[0][5] is NULL_DATE and decoded[3][3] == str2Date('20220120')
+    calls = [Call(s._plan, r) for r in decoded]
+    assert encode_call_rows(calls) == rows
+    assert [Call(s._plan, r).get_call_in_list() for r in rows] == rows
+    assert CallTable.from_rows(s._plan, rows).get_call_list() == rows
+
+
+def test_load_and_save_through_the_codec(plan_data):
+    store = MemoryScheduleStore()
+    s = SingleCycleScheduler(MaintenancePlan(plan_data()), store=store)
+    s.start_scheduling(str2Date('20200101'))
+    s.save_to_DB()
+    loaded = SingleCycleScheduler(MaintenancePlan(plan_data()), store=store)
+    assert loaded.get_call_list() == store.load_plan('1000001') == \
+        [c.get_call_in_list() for c in s.calls]
+    assert loaded.calls[1].last_planned_date == s.calls[0].planned_date
+    assert loaded.calls[0].last_planned_date == NULL_DATE
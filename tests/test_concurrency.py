@@ -0,0 +1,75 @@
+import gc
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy
+
+import plan_alg
+from plan_alg import (Clock, MaintenancePlan, SingleCycleScheduler, SqliteScheduleStore,
+                      forecast_plans, str2Date, SS_CALLED, SS_HOLD, SS_SAVE_TO_CALL)
+
+
+def test_named_locks_are_released_with_their_schedulers(plan_data, tmp_path):
+    store = SqliteScheduleStore(str(tmp_path / 'MHIS.db'))
+    before = len(plan_alg._named_locks)
+    schedulers = [SingleCycleScheduler(MaintenancePlan(plan_data(f'L{i}')), store=store)
+                  for i in range(50)]
+    again = SingleCycleScheduler(MaintenancePlan(plan_data('L0')), store=store)
+    assert again._lock is schedulers[0]._lock
+    assert len(plan_alg._named_locks) == before + 50
+    del schedulers, again
+    gc.collect()
+    assert len(plan_alg._named_locks) == before
+    store.close()
+
+
+def test_threads_share_schedulers_and_store(plan_data, tmp_path):
+    store = SqliteScheduleStore(str(tmp_path / 'MHIS.db'))
+    start = str2Date('20230601')
+    schedulers = []
+    for i in range(8):
+        s = SingleCycleScheduler(MaintenancePlan(plan_data(f'T{i}', cycle=7, cycle_unit='D')),
+                                 store=store, clock=Clock(today=start + timedelta(days=i)))
+        s.start_scheduling(start)
+        schedulers.append(s)
+
+    def operate(args):
+        s, r = args
+        for _ in range(20):
+            c = s.calls[r.randrange(len(s.calls))]
+            if c.status == SS_HOLD:
+                s.release_call(c)
+            elif c.status == SS_SAVE_TO_CALL:
+                s.create_call_objects()
+            elif c.status == SS_CALLED:
+                s.complete_call(c, c.planned_date)
+            s.get_call_list()
+        s.save_to_DB()
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(operate, [(schedulers[i % 8], random.Random(i)) for i in range(32)]))
+    for s in schedulers:
+        assert store.load_plan(s._plan.plan_num) == s.get_call_list()
+    # the connections of the ended pool threads are closed by the next thread
+    thread = threading.Thread(target=store.load_plan, args=('T0',))
+    thread.start()
+    thread.join()
+    store.load_plan('T0')
+    assert len(store._connections) <= 2
+    store.close()
+    assert store._connections == {}
+
+
+def test_forecast_uses_the_given_clock(plan_data):
+    params = [plan_data(f'F{i}', cycle=30 + i, cycle_unit='D', start_date='20230101',
+                        call_horizon=50) for i in range(5)]
+    clock = Clock(interval=10, today=str2Date('20230301'))
+    by_clock = forecast_plans(params, clock=clock)
+    by_dates = forecast_plans(params, today=str2Date('20230301'),
+                              reference_date=str2Date('20230311'))
+    assert numpy.array_equal(by_clock.call_date, by_dates.call_date)
+    assert numpy.array_equal(by_clock.released, by_dates.released)
+    # the System clock (frozen to 20230601) is not used
+    assert not numpy.array_equal(forecast_plans(params).released, by_clock.released)
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+import plan_alg
+from plan_alg import (CounterPlan, MeasuringDocuments, MeasuringPoint, MemoryScheduleStore,
+                      SingleCycleScheduler, build_scheduler, str2Date, SI_COUNTER_BASED,
+                      SI_MULTI_COUNTER, TABLE_MEASURING_DOC)
+
+
+def _counter_definition(plan_data, plan_num, point='P1', **overrides):
+    return {'plan': plan_data(plan_num, cycle=1000, cycle_unit='D', call_horizon=0,
+                              scheduling_indicator=SI_COUNTER_BASED, measuring_point=point,
+                              start_date='20230101', **overrides)}
+
+
+def _write_documents():
+    with open(TABLE_MEASURING_DOC, 'w') as f:
+        json.dump({'P1': [['20230101', 0], ['20230501', 1200]],
+                   'P2': [['20230101', 0], ['20230601', 500]]}, f)
+
+
+def test_counter_plan_schedules_by_usage_rate(plan_data):
+    _write_documents()
+    s = build_scheduler(_counter_definition(plan_data, '1000001'), MemoryScheduleStore())
+    assert isinstance(s, SingleCycleScheduler) and isinstance(s._plan, CounterPlan)
+    s.start_scheduling(str2Date('20230101'))
+    # 1200 per 120 days: 1000 is reached after 100 days
+    assert s.calls[0].planned_date == str2Date('20230411')
+
+
+def test_documents_are_read_once_per_run(plan_data, monkeypatch):
+    _write_documents()
+    definitions = [_counter_definition(plan_data, f'100000{i}', point=f'P{i % 2 + 1}')
+                   for i in range(6)] + [{'plan': plan_data('2000001')}]
+    store = MemoryScheduleStore()
+    documents = MeasuringDocuments()
+    for d in definitions:
+        s = build_scheduler(d, store, documents=documents)
+        s.start_scheduling(str2Date('20230101'))
+        s.save_to_DB()
+
+    loads = []
+    init = MeasuringDocuments.__init__
+
+    def counting_init(self, *args, **kwargs):
+        loads.append(1)
+        init(self, *args, **kwargs)
+    monkeypatch.setattr(MeasuringDocuments, '__init__', counting_init)
+    shards = []
+    for shard in (definitions[:3], definitions[3:6], definitions[6:]):
+        loads.clear()
+        results, failures = plan_alg._monitor_shard(shard, store)
+        assert failures == {} and len(results) == len(shard)
+        shards.append(len(loads))
+    assert shards == [1, 1, 0]
+
+
+def _documents():
+    documents = MeasuringDocuments(None)
+    for point, readings in (('P1', [('20230101', 0), ('20230501', 1200)]),  # 10 a day
+                            ('P2', [('20230101', 0), ('20230601', 500)])):  # about 3.3
+        for d, reading in readings:
+            documents.add_reading(point, str2Date(d), reading)
+    return documents
+
+
+def _multi_counter_scheduler(plan_data, documents, **overrides):
+    overrides = dict({'scheduling_indicator': SI_MULTI_COUNTER}, **overrides)
+    params = plan_data(cycle=1000, cycle_unit='D', call_horizon=0, start_date='20230101',
+                       counters=[{'point': 'P1', 'cycle': 1000}, {'point': 'P2', 'cycle': 200}],
+                       **overrides)
+    s = SingleCycleScheduler(CounterPlan(params, documents), store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20230101'))
+    return s
+
+
+def test_multi_counter_logic(plan_data):
+    documents = _documents()
+    earliest = _multi_counter_scheduler(plan_data, documents, counter_logic='OR')
+    latest = _multi_counter_scheduler(plan_data, documents, counter_logic='AND')
+    assert earliest.calls[0].planned_date == str2Date('20230303')  # 200 on P2 after 61 days
+    assert latest.calls[0].planned_date == str2Date('20230411')  # 1000 on P1 after 100 days
+    assert earliest._plan.cycle_in_days() == pytest.approx(60.4)
+    assert latest._plan.cycle_in_days() == pytest.approx(100)
+    with pytest.raises(ValueError):
+        _multi_counter_scheduler(plan_data, documents, counter_logic='XOR')
+    with pytest.raises(ValueError):  # counter based plans have exactly one counter
+        _multi_counter_scheduler(plan_data, documents, scheduling_indicator=SI_COUNTER_BASED)
+
+
+def test_counter_offset(plan_data):
+    params = plan_data(cycle=1000, cycle_unit='D', offset=500, call_horizon=0,
+                       start_date='20230101', scheduling_indicator=SI_COUNTER_BASED,
+                       measuring_point='P1')
+    plan = CounterPlan(params, _documents())
+    assert plan.offset_in_days() == 50
+    s = SingleCycleScheduler(plan, store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20230101'))
+    assert [c.planned_date for c in s.calls[:2]] == [str2Date('20230220'), str2Date('20230531')]
+
+
+def test_readings_are_interpolated_and_extrapolated():
+    mp = _documents().point('P1')
+    assert mp.reading_at(str2Date('20230301')) == 590  # between the readings
+    assert mp.reading_at(str2Date('20230601')) == 1510  # at the usage rate after
+    assert mp.reading_at(str2Date('20221222')) == -100  # and before
+    assert mp.date_of_reading(600) == str2Date('20230302')
+    assert mp.date_of_reading(1500) == str2Date('20230531')
+    assert mp.date_of_reading(-50) == str2Date('20221227')
+
+
+def test_annual_estimate_until_two_readings():
+    documents = MeasuringDocuments(None)
+    mp = documents.point('P3', annual_estimate=365)
+    with pytest.raises(ValueError):
+        mp.reading_at(str2Date('20230101'))  # no readings
+    documents.add_reading('P3', str2Date('20230101'), 100)
+    assert mp.rate() == 1
+    assert mp.date_of_reading(130) == str2Date('20230131')
+    documents.add_reading('P3', str2Date('20230111'), 150)
+    assert mp.rate() == 5
+    assert MeasuringPoint('P4').annual_estimate == 0
+    with pytest.raises(ValueError):
+        MeasuringPoint('P4').rate()
+
+
+def test_non_monotonic_readings_are_rejected():
+    documents = _documents()
+    with pytest.raises(ValueError):
+        documents.add_reading('P1', str2Date('20230301'), 1300)  # above the later reading
+    with pytest.raises(ValueError):
+        documents.add_reading('P1', str2Date('20230601'), 1100)  # below the last reading
+    with pytest.raises(ValueError):
+        documents.add_reading('P1', str2Date('20230501'), -1)  # replaced same day reading
+    documents.add_reading('P1', str2Date('20230501'), 1250)
+    assert documents.point('P1').reading_at(str2Date('20230501')) == 1250
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import timedelta
+
+from plan_alg import (Clock, DeadlineMonitor, MaintenancePlan, MemoryScheduleStore,
+                      SingleCycleScheduler, str2Date, SS_HOLD, SS_SAVE_TO_CALL)
+
+
+def _scheduler(plan_data, clock=None, **overrides):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(**overrides)), store=MemoryScheduleStore(),
+                             clock=clock)
+    s.start_scheduling(str2Date('20230601'))
+    return s
+
+
+def _hold(s):
+    return [c for c in s.calls if c.status == SS_HOLD]
+
+
+def test_watch_keeps_one_entry_per_call(plan_data):
+    s = _scheduler(plan_data)
+    monitor = DeadlineMonitor([s])
+    n = len(monitor)
+    assert n == len(_hold(s)) > 0
+    monitor.watch(s)
+    monitor.watch(s)
+    assert len(monitor) == n
+    assert sum(len(heap) for heap in monitor._heaps.values()) == n
+
+
+def test_release_due_uses_the_given_date(plan_data, frozen_today):
+    s = _scheduler(plan_data)
+    monitor = DeadlineMonitor([s])
+    c = _hold(s)[0]
+    crossing = monitor.next_crossing()
+    assert monitor.release_due(crossing - timedelta(days=1)) == {}
+    # the System clock is still before the crossing
+    assert frozen_today.today() < crossing
+    released = monitor.release_due(crossing)
+    assert released == {s: [c]}
+    assert c.status == SS_SAVE_TO_CALL and c.call_date == crossing
+    assert c.call_num in s._changed
+
+
+def test_release_due_defaults_to_the_scheduler_clock(plan_data):
+    clock = Clock(today=str2Date('20230601'))
+    s = _scheduler(plan_data, clock=clock)
+    monitor = DeadlineMonitor([s])
+    c = _hold(s)[0]
+    assert monitor.release_due() == {}
+    clock.set_today(monitor.next_crossing())
+    assert monitor.release_due() == {s: [c]}
+    assert c.call_date == clock.today()
+
+
+def test_run_releases_calls_due_on_the_clock(plan_data):
+    clock = Clock(today=str2Date('20230601'))
+    s = _scheduler(plan_data, clock=clock)
+    released = []
+    monitor = DeadlineMonitor([s], on_release=lambda s, calls: released.extend(calls))
+    clock.set_today(monitor.next_crossing())
+
+    async def main():
+        task = asyncio.ensure_future(monitor.run())
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        await task
+    asyncio.run(main())
+    assert len(released) == 1 and released[0].status == SS_SAVE_TO_CALL
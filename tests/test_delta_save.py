@@ -0,0 +1,79 @@
+import contextlib
+import io
+import random
+from datetime import timedelta
+
+import pytest
+
+import plan_bench
+from plan_alg import (LocalCallObjectSink, MaintenancePlan, ShardedJsonScheduleStore,
+                      SingleCycleScheduler, str2Date, SS_CALLED, SS_HOLD, SS_SAVE_TO_CALL)
+from plan_bench import BENCH_KINDS
+
+
+@pytest.fixture(params=['memory', 'json', 'sqlite', 'sharded'])
+def delta_store(request, tmp_path):
+    if request.param == 'sharded':
+        return ShardedJsonScheduleStore(str(tmp_path / 'MHIS'), shards=4)
+    return plan_bench._make_store(request.param, str(tmp_path), 'MHIS')
+
+
+def _operate(s, b, rng, frozen_today):
+    op = rng.random()
+    with contextlib.suppress(ValueError), contextlib.redirect_stdout(io.StringIO()):
+        if op < 0.25:
+            plan_bench._complete_first_called(rng)(s)
+        elif op < 0.4:
+            hold = [c for c in s.calls if c.status == SS_HOLD]
+            if hold:
+                s.release_call(hold[0])
+        elif op < 0.5:
+            s.create_call_objects()
+        elif op < 0.6:
+            frozen_today.set_today(frozen_today.today() + timedelta(days=rng.randint(1, 40)))
+            s.update_scheduling()
+        elif op < 0.7:
+            s.compact_calls()
+        elif op < 0.75:
+            s.start_scheduling(b.start_date())
+        else:
+            s.update_scheduling()
+
+
+# a delta save leaves the store as a full save of the schedule would
+@pytest.mark.parametrize('window', [None, 60])
+def test_delta_saves_match_the_schedule(delta_store, window, frozen_today):
+    rng = random.Random(11)
+    for i in range(6):
+        b = rng.choice(list(BENCH_KINDS.values()))(i, rng, delta_store, frozen_today.today())
+        s = b.build_scheduler()
+        s.window_days = window
+        s.start_scheduling(b.start_date())
+        s.save_to_DB()
+        for _ in range(20):
+            if rng.random() < 0.3:  # continue on a reloaded schedule
+                s = b.build_scheduler()
+                s.window_days = window
+            _operate(s, b, rng, frozen_today)
+            s.save_to_DB()
+            end = None if window is None else s._window_end_date()
+            expected = sorted(c.get_call_in_list() for c in s.calls if s._saved_call(c, end))
+            assert sorted(delta_store.load_plan(s._plan.plan_num)) == expected
+            assert sorted(b.build_scheduler().get_call_list()) == expected
+
+
+def test_created_call_objects_are_saved(delta_store, plan_data):
+    def scheduler(sink=None):
+        return SingleCycleScheduler(MaintenancePlan(plan_data(cycle=7, cycle_unit='D',
+                                                              call_horizon=100)),
+                                    store=delta_store, sink=sink)
+    # the sink is down: the released calls are saved to be called later
+    s = scheduler(LocalCallObjectSink(retries=0, failures=1))
+    s.start_scheduling(str2Date('20230101'))
+    s.save_to_DB()
+    assert any(r[8] == SS_SAVE_TO_CALL for r in delta_store.load_plan(s._plan.plan_num))
+    loaded = scheduler()
+    loaded.save_to_DB()  # creates the call objects and saves the change
+    assert delta_store.load_plan(s._plan.plan_num) == loaded.get_call_list()
+    assert all(r[8] != SS_SAVE_TO_CALL for r in delta_store.load_plan(s._plan.plan_num))
+    assert any(c.status == SS_CALLED for c in loaded.calls)
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import random
+from datetime import timedelta
+
+import pytest
+
+import plan_alg as pa
+from plan_bench import BENCH_KINDS
+
+
+def _step(s, r, frozen_today):
+    op = r.random()
+    k = r.randrange(len(s.calls)) if s.calls else None
+    if op < 0.3 and k is not None:
+        c = s.calls[k]
+        if c.status == pa.SS_SAVE_TO_CALL:
+            s.create_call_objects()
+        if c.status == pa.SS_CALLED:
+            s.complete_call(c, c.planned_date + timedelta(days=r.randint(-20, 30)))
+    elif op < 0.45 and k is not None:
+        s.release_call(s.calls[k])
+    elif op < 0.55 and k is not None:
+        with contextlib.suppress(Exception):
+            s.skip_call(s.calls[k])
+    elif op < 0.65 and k:
+        d = r.randint(-10, 10)
+        nc = s.calls[k + 1] if k + 1 < len(s.calls) else None
+        with contextlib.suppress(AttributeError):
+            s.fix_call(s.calls[k], s.calls[k].planned_date + timedelta(days=d), nc)
+    elif op < 0.75:
+        frozen_today.set_today(frozen_today.today() + timedelta(days=r.randint(0, 40)))
+    elif op < 0.8:
+        s.create_call_objects()
+    elif op < 0.83:
+        s.compact_calls()
+
+
+# the same random operations on two schedulers, one refreshed incrementally
+# and one fully refreshed after every step, must give the same calls
+@pytest.mark.parametrize('kind', sorted(BENCH_KINDS))
+def test_dirty_refresh_matches_full_refresh(kind, frozen_today):
+    for i in range(12):
+        day = pa.str2Date('20230601')
+        schedulers = []
+        for invalidate in (False, True):
+            frozen_today.set_today(day)
+            b = BENCH_KINDS[kind](i, random.Random(i), pa.MemoryScheduleStore(), day)
+            s = b.build_scheduler()
+            s.start_scheduling(b.start_date())
+            schedulers.append((s, invalidate))
+        rngs = [random.Random(i * 7) for _ in schedulers]
+        for _ in range(30):
+            for (s, invalidate), r in zip(schedulers, rngs):
+                frozen_today.set_today(day)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if invalidate:
+                        s.invalidate()
+                    _step(s, r, frozen_today)
+                    if invalidate:
+                        s.invalidate()
+                    with contextlib.suppress(ValueError):
+                        s.update_scheduling()
+            day = frozen_today.today()
+            incremental, full = (s for s, _ in schedulers)
+            assert incremental.get_call_list() == full.get_call_list()
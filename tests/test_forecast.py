@@ -0,0 +1,32 @@
+import random
+from datetime import timedelta
+
+from plan_alg import (MaintenancePlan, MemoryScheduleStore, SingleCycleScheduler,
+                      forecast_plans, date2Str, str2Date, SI_TIME, SI_KEY_DATE)
+
+
+def test_forecast_matches_start_scheduling(plan_data):
+    rng = random.Random(3)
+    params = []
+    for i in range(60):
+        si = rng.choice([SI_TIME, SI_KEY_DATE])
+        start = str2Date('20230601') - timedelta(days=rng.randint(0, 400))
+        params.append(plan_data(
+            f'F{i:04d}',
+            cycle=rng.choice([7, 10, 45] if si == SI_TIME else [30, 60, 90]), cycle_unit='D',
+            offset=rng.choice([0, 0, 5]),
+            call_horizon=rng.choice([0, 50, 90]),
+            schedule_period=rng.choice([90, 365]),
+            start_date=date2Str(start),
+            scheduling_indicator=si))
+    forecast = forecast_plans(params)
+    statuses = forecast.statuses()
+    for pp in params:
+        s = SingleCycleScheduler(MaintenancePlan(dict(pp)), store=MemoryScheduleStore())
+        s.start_scheduling(str2Date(pp['start_date']))
+        rows = forecast._plan_slice(pp['plan_num'])
+        assert [c.planned_date for c in s.calls] == \
+            [d.astype(object) for d in forecast.planned_dates(pp['plan_num'])]
+        assert [c.call_date for c in s.calls] == \
+            [d.astype(object) for d in forecast.call_dates(pp['plan_num'])]
+        assert [c.status for c in s.calls] == list(statuses[rows])
@@ -0,0 +1,52 @@
+import itertools
+import random
+
+import pytest
+
+from plan_alg import MemoryScheduleStore, str2Date
+from plan_bench import BENCH_KINDS
+
+
+def _scheduler(kind, i=1):
+    b = BENCH_KINDS[kind](i, random.Random(i), MemoryScheduleStore(), str2Date('20230601'))
+    s = b.build_scheduler()
+    s.start_scheduling(b.start_date())
+    return s
+
+
+def _state(c):
+    return (c.get_call_in_list(), c.prev_call)
+
+
+@pytest.mark.parametrize('kind', ['single_cycle', 'strategy'])
+def test_future_calls_continue_the_schedule(kind):
+    s = _scheduler(kind)
+    scheduled = [c.get_call_in_list() for c in s.calls]
+    last = s.calls[len(s.calls) // 2]
+    expected = scheduled[len(s.calls) // 2 + 1:]
+    generated = list(itertools.islice(s.iter_future_calls(last_call=last), len(expected)))
+    assert [c.get_call_in_list() for c in generated] == expected
+    assert [c.get_call_in_list() for c in s.calls] == scheduled
+
+
+@pytest.mark.parametrize('kind', ['single_cycle', 'strategy'])
+def test_yielded_calls_are_not_changed(kind):
+    s = _scheduler(kind)
+    kept = []
+    for c in itertools.islice(s.iter_future_calls(), 200):
+        kept.append((c, _state(c)))
+    for c, state in kept:
+        assert _state(c) == state
+    # each call links only to a detached copy of its predecessor
+    assert kept[0][0].prev_call is s.get_last_scheduled_call()
+    for (prev, _), (c, _) in zip(kept, kept[1:]):
+        assert c.prev_call is not prev and c.prev_call.prev_call is None
+        assert c.prev_call.get_call_in_list() == prev.get_call_in_list()
+
+
+def test_future_calls_without_schedule():
+    s = _scheduler('single_cycle')
+    s._set_calls([])
+    calls = list(s.iter_future_calls(end_date=str2Date('20240101')))
+    assert calls and calls[0].prev_call is None
+    assert all(c.planned_date <= str2Date('20240101') for c in calls)
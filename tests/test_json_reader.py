@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from plan_alg import read_plans_in_json
+
+
+def _write(tmp_path, text):
+    path = tmp_path / 'MHIS.json'
+    path.write_text(text)
+    return str(path)
+
+
+def test_reads_only_the_requested_plans(tmp_path):
+    data = {'A': [[1, '20230101', '', 'x"y', [1, 2]]],
+            'B\\"{[': [[2, 'a]b', {'k': [1, {'z': '}'}]}]],
+            'C': [], 'D': {'nested': [1, 2, 3]}}
+    for indent in (None, 2):
+        path = _write(tmp_path, json.dumps(data, indent=indent))
+        assert read_plans_in_json(path, ['A', 'B\\"{[', 'D', 'missing']) == \
+            {k: data[k] for k in ['A', 'B\\"{[', 'D']}
+        assert read_plans_in_json(path, []) == {}
+
+
+def test_empty_and_invalid_files(tmp_path):
+    assert read_plans_in_json(_write(tmp_path, ''), ['A']) == {}
+    assert read_plans_in_json(_write(tmp_path, ' {} '), ['A']) == {}
+    with pytest.raises(ValueError):
+        read_plans_in_json(_write(tmp_path, '[1, 2]'), ['A'])
+    with pytest.raises(ValueError):
+        read_plans_in_json(_write(tmp_path, '{"A": [1, 2'), ['A'])
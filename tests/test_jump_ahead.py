@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+import pytest
+
+import plan_alg
+from plan_alg import (MaintenancePlan, MemoryScheduleStore, SingleCycleScheduler, str2Date,
+                      SI_FACTORY_CALENDAR, SI_KEY_DATE, SI_TIME, _shortest_month, _month_length)
+
+
+def _key_date_plan(plan_data, months, start='20230101'):
+    return MaintenancePlan(plan_data(cycle=months, cycle_unit='MON', start_date=start,
+                                     scheduling_indicator=SI_KEY_DATE))
+
+
+@pytest.mark.parametrize('months', [1, 2, 3, 5, 6, 7, 12, 24, 48])
+@pytest.mark.parametrize('first', ['20230131', '20240229', '20230330', '20240131', '20230829'])
+def test_jump_ahead_matches_stepping(plan_data, months, first):
+    plan = _key_date_plan(plan_data, months)
+    first_date = str2Date(first)
+    d = first_date
+    for n in range(1, 130):
+        assert plan.planned_date_of_call(n, first_date) == d
+        d = plan.next_plan_date(d)
+
+
+def test_shortest_month_matches_scan():
+    for m0 in range(2000 * 12, 2008 * 12, 5):
+        for months in (1, 5, 12, 24, 48, 4800):
+            for count in (1, 3, 13, 40, 200):
+                scan = min(_month_length(*divmod(m0 + k * months, 12))
+                           for k in range(1, count + 1))
+                assert _shortest_month(m0, months, count) == scan
+
+
+def test_yearly_month_end_jump_takes_constant_time(plan_data, monkeypatch):
+    lengths = []
+
+    def counted_month_length(year, month):
+        lengths.append(month)
+        return _month_length(year, month)
+    monkeypatch.setattr(plan_alg, '_month_length', counted_month_length)
+    plan = _key_date_plan(plan_data, 12)
+    assert plan.planned_date_of_call(7000, str2Date('20240131')) == date(9023, 1, 31)
+    feb = _key_date_plan(plan_data, 48, start='20240229')
+    # every fourth year is a leap year up to 2100
+    assert feb.planned_date_of_call(19, str2Date('20240229')) == date(2096, 2, 29)
+    assert feb.planned_date_of_call(1000, str2Date('20240229')) == date(6020, 2, 28)
+    assert len(lengths) < 100
+
+
+def _stepped_dates(plan, count):
+    dates = [plan.first_planned_date()]
+    while len(dates) < count:
+        dates.append(plan.next_plan_date(dates[-1]))
+    return dates
+
+
+def _index_by_scan(dates, d):
+    return sum(1 for x in dates if x <= d)
+
+
+@pytest.mark.parametrize('overrides', [{'cycle': 9}, {'cycle': 1, 'cycle_unit': 'MON'},
+                                       {'cycle': 10, 'cycle_change_factor': 2},
+                                       {'cycle': 14, 'offset': 5},
+                                       {'cycle': 7, 'offset': 3, 'cycle_change_factor': 3}])
+def test_time_plan_date_index_matches_stepping(plan_data, overrides):
+    overrides = dict({'cycle_unit': 'D', 'start_date': '20230101'}, **overrides)
+    plan = MaintenancePlan(plan_data(**overrides))
+    dates = _stepped_dates(plan, 60)
+    assert [plan.planned_date_of_call(n) for n in range(1, 61)] == dates
+    d = plan.start_date
+    while d < dates[-1]:
+        assert plan.call_index_of_date(d) == _index_by_scan(dates, d)
+        d += timedelta(days=1)
+
+
+def _scheduler(plan_data, **overrides):
+    overrides = dict({'cycle': 20, 'cycle_unit': 'D', 'start_date': '20230101',
+                      'call_horizon': 100, 'schedule_period': 120}, **overrides)
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(**overrides)), store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20230101'))
+    return s
+
+
+def _check_consistent(s, last_day):
+    dates = [s.planned_date_of_call(n) for n in range(1, 40)]
+    assert dates == sorted(dates)
+    d = str2Date('20230101')
+    while d <= last_day:
+        assert s.call_index_of_date(d) == _index_by_scan(dates, d)
+        d += timedelta(days=1)
+    return dates
+
+
+# scheduled calls, then jump-ahead (SI_TIME) or stepping (factory calendar) past them
+@pytest.mark.parametrize('si', [SI_TIME, SI_FACTORY_CALENDAR])
+def test_scheduler_dates_continue_the_schedule(plan_data, si):
+    s = _scheduler(plan_data, scheduling_indicator=si)
+    full = _scheduler(plan_data, scheduling_indicator=si, schedule_period=800)
+    assert len(s.calls) < 39 <= len(full.calls)
+    dates = _check_consistent(s, str2Date('20250101'))
+    assert dates == [c.planned_date for c in full.calls[:39]]
+
+
+@pytest.mark.parametrize('si', [SI_TIME, SI_FACTORY_CALENDAR])
+def test_scheduler_dates_after_early_completion(plan_data, si):
+    s = _scheduler(plan_data, scheduling_indicator=si)
+    s.create_call_objects()
+    first = s.calls[0]
+    s.complete_call(first, first.planned_date - timedelta(days=5))
+    stored = s.get_call(2).planned_date
+    assert s.planned_date_of_call(2) == stored
+    # the stored call 2 decides, not a call stepped from the early completion
+    assert s.call_index_of_date(stored - timedelta(days=5)) == 1
+    assert s.call_index_of_date(stored) == 2
+    _check_consistent(s, str2Date('20250101'))
@@ -0,0 +1,43 @@
+import plan_alg
+from plan_alg import Metrics, collect_metrics, FactoryCalendar, str2Date
+
+
+def test_metrics_wrap_targets_only_while_enabled():
+    original = plan_alg.Scheduler.__dict__['update_scheduling']
+    with collect_metrics(reset=True) as metrics:
+        assert metrics.enabled
+        assert plan_alg.Scheduler.__dict__['update_scheduling'] is not original
+        with collect_metrics():  # nested collection keeps the wrappers
+            pass
+        assert metrics.enabled
+    assert not Metrics.get_instance().enabled
+    assert plan_alg.Scheduler.__dict__['update_scheduling'] is original
+
+
+def test_metrics_count_calls_errors_and_buckets():
+    with collect_metrics(reset=True) as metrics:
+        cal = FactoryCalendar(['20230605'])
+        for _ in range(3):
+            cal.add_workdays(str2Date('20230601'), 5)
+        try:
+            cal.add_workdays(None, 5)
+        except Exception:
+            pass
+    m = metrics.snapshot()['FactoryCalendar.add_workdays']
+    assert m['count'] == 4 and m['errors'] == 1
+    assert m['buckets']['+Inf'] == 4
+    assert list(m['buckets'].values()) == sorted(m['buckets'].values())
+
+
+def test_prometheus_export():
+    metrics = Metrics.get_instance()
+    metrics.reset()
+    metrics.record('x.y', 0.002)
+    metrics.record('x.y', 2, failed=True)
+    text = metrics.to_prometheus()
+    assert 'plan_alg_operation_seconds_bucket{operation="x.y",le="0.005"} 1' in text
+    assert 'plan_alg_operation_seconds_bucket{operation="x.y",le="+Inf"} 2' in text
+    assert 'plan_alg_operation_seconds_count{operation="x.y"} 2' in text
+    assert 'plan_alg_operation_errors_total{operation="x.y"} 1' in text
+    metrics.reset()
+    assert metrics.snapshot() == {}
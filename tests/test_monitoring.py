@@ -0,0 +1,58 @@
+import multiprocessing
+
+import pytest
+
+from plan_alg import (JsonScheduleStore, MemoryScheduleStore, build_scheduler,
+                      run_deadline_monitoring, str2Date, SS_CALLED, SS_SAVE_TO_CALL)
+
+
+class CountingJsonStore(JsonScheduleStore):
+    saves = 0
+
+    def save_plans(self, plans: dict):
+        CountingJsonStore.saves += 1
+        super().save_plans(plans)
+
+
+def _definitions(plan_data, n):
+    return [{'plan': plan_data(f'M{i:04d}', cycle=10 + i % 5, cycle_unit='D',
+                                 start_date='20230401')}
+            for i in range(n)]
+
+
+# spawned workers start with the wall clock, the frozen date must reach them
+@pytest.mark.parametrize('start_method', [None, 'spawn'])
+def test_monitoring_matches_serial_update(tmp_path, plan_data, start_method):
+    definitions = _definitions(plan_data, 24)
+    store = CountingJsonStore(str(tmp_path / 'MHIS.json'))
+    for d in definitions:
+        s = build_scheduler(d, store)
+        s.start_scheduling(str2Date('20230401'))
+        store.save_plan(d['plan']['plan_num'], s.get_call_list())
+    CountingJsonStore.saves = 0
+
+    mp_context = None if start_method is None else multiprocessing.get_context(start_method)
+    results, failures = run_deadline_monitoring(definitions, store, workers=2, shard_size=5,
+                                                mp_context=mp_context)
+
+    assert failures == {}
+    assert CountingJsonStore.saves == 1  # written once, by this process
+    for d in definitions:
+        num = d['plan']['plan_num']
+        expected = build_scheduler(d, MemoryScheduleStore({num: []}))
+        expected.start_scheduling(str2Date('20230401'))
+        expected.update_scheduling()
+        expected.create_call_objects()
+        assert results[num] == expected.get_call_list()
+        assert store.load_plan(num) == results[num]
+        assert any(r[8] == SS_CALLED for r in results[num])
+        assert all(r[8] != SS_SAVE_TO_CALL for r in results[num])
+
+
+def test_monitoring_reports_failed_plans(tmp_path, plan_data):
+    definitions = _definitions(plan_data, 3)  # no calls: update_scheduling() fails
+    store = JsonScheduleStore(str(tmp_path / 'MHIS.json'))
+    results, failures = run_deadline_monitoring(definitions, store, workers=1)
+    assert results == {}
+    assert sorted(failures) == ['M0000', 'M0001', 'M0002']
+    assert all(f.startswith('ValueError') for f in failures.values())
@@ -0,0 +1,68 @@
+from datetime import date
+
+import numpy
+import pytest
+
+import plan_alg
+from plan_alg import (MaintenancePlan, MonthDelta, add_months_to_ordinals, SI_FACTORY_CALENDAR,
+                      SI_KEY_DATE, SI_TIME, _month_delta)
+
+
+def test_vectorized_months_match_month_delta():
+    ordinals = numpy.arange(date(1896, 1, 1).toordinal(), date(2104, 12, 31).toordinal(), 11)
+    for months in range(-30, 31):
+        expected = [(date.fromordinal(int(o)) + MonthDelta(months)).toordinal() for o in ordinals]
+        assert add_months_to_ordinals(ordinals, months).tolist() == expected
+
+
+def test_month_ends_and_month_arrays():
+    ordinals = [date(2024, 1, 31).toordinal(), date(2024, 2, 29).toordinal(),
+                date(2023, 3, 31).toordinal(), date(2000, 2, 29).toordinal()]
+    months = [1, 12, -1, 1200]
+    assert add_months_to_ordinals(ordinals, months).tolist() == \
+        [(date.fromordinal(o) + MonthDelta(m)).toordinal() for o, m in zip(ordinals, months)]
+    assert date.fromordinal(int(add_months_to_ordinals(ordinals[1], 12))) == date(2025, 2, 28)
+    with pytest.raises(OverflowError):
+        add_months_to_ordinals([date(9999, 12, 1).toordinal()], 1)
+
+
+@pytest.mark.parametrize('si', [SI_TIME, SI_KEY_DATE, SI_FACTORY_CALENDAR])
+def test_ordinals_add_by_scheduling_indicator(plan_data, si):
+    plan = MaintenancePlan(plan_data(cycle=3, scheduling_indicator=si))
+    rng = numpy.random.default_rng(1)
+    ordinals = numpy.arange(date(2023, 9, 1).toordinal(), date(2023, 12, 1).toordinal())
+    deltas = rng.choice([1, 30, 91, 365], ordinals.size)
+    if si == SI_FACTORY_CALENDAR:
+        deltas = rng.integers(1, 10, ordinals.size)
+    expected = [plan.date_add_by_scheduling_indicator(date.fromordinal(int(o)), int(d)).toordinal()
+                for o, d in zip(ordinals, deltas)]
+    assert plan.ordinals_add_by_scheduling_indicator(ordinals, deltas).tolist() == expected
+
+
+def test_month_delta_cache_takes_only_ints(plan_data):
+    plan_alg._cached_month_delta.cache_clear()
+    assert _month_delta(3) == MonthDelta(3)
+    with pytest.raises(TypeError):
+        _month_delta(3.0)
+    plan = MaintenancePlan(plan_data(scheduling_indicator=SI_KEY_DATE))
+    assert plan.date_add_by_scheduling_indicator(date(2023, 1, 31), 90) == date(2023, 4, 30)
+    with pytest.raises(TypeError):  # as MonthDelta(3.0)
+        plan.date_add_by_scheduling_indicator(date(2023, 1, 31), 90.0)
+    for months in range(5000):
+        _month_delta(months)
+    assert plan_alg._cached_month_delta.cache_info().currsize == plan_alg.MONTH_DELTA_CACHE_SIZE
+
+
+def test_vectorized_months_take_only_ints(plan_data):
+    ordinals = [date(2023, 1, 31).toordinal()]
+    assert add_months_to_ordinals(ordinals, numpy.array([1], dtype=numpy.uint8))[0] == \
+        date(2023, 2, 28).toordinal()
+    for months in (1.0, [1.5], numpy.array([2.0]), [True]):
+        with pytest.raises(TypeError, match='months must be an integer'):
+            add_months_to_ordinals(ordinals, months)
+    plan = MaintenancePlan(plan_data(scheduling_indicator=SI_KEY_DATE))
+    assert plan.ordinals_add_by_scheduling_indicator(ordinals, 90)[0] == date(2023, 4, 30).toordinal()
+    with pytest.raises(TypeError):  # as date_add_by_scheduling_indicator(..., 90.0)
+        plan.ordinals_add_by_scheduling_indicator(ordinals, 90.0)
+    plan = MaintenancePlan(plan_data(scheduling_indicator=SI_TIME))
+    assert plan.ordinals_add_by_scheduling_indicator(ordinals, [1.5])[0] == ordinals[0] + 1
@@ -0,0 +1,57 @@
+import pytest
+
+import plan_alg
+from plan_alg import (MaintenancePlan, MemoryScheduleStore, SchedulingRegistry, build_scheduler,
+                      str2Date, SI_FACTORY_CALENDAR)
+from test_strategy import HOURLY_HEAD, HOURLY_PACKAGES, MONTHLY_HEAD, MONTHLY_PACKAGES
+
+
+def test_calendars_are_built_once_and_frozen():
+    registry = SchedulingRegistry()
+    registry.register_calendar('DE', ['20230605', '20230606'])
+    fc = registry.calendar('DE')
+    assert registry.calendar('DE') is fc
+    assert fc.add_workdays(str2Date('20230603'), 1) == str2Date('20230607')
+    with pytest.raises(AttributeError):
+        fc._first = 0
+    registry.register_calendar('DE', ['20230605'])
+    assert registry.calendar('DE') is not fc
+    with pytest.raises(ValueError):
+        registry.calendar('XX')
+
+
+def test_plans_share_the_registered_calendar(plan_data):
+    plans = [MaintenancePlan(plan_data(f'10{i}', scheduling_indicator=SI_FACTORY_CALENDAR))
+             for i in range(3)]
+    shared = SchedulingRegistry.get_instance().calendar('00')
+    assert all(p.calendar is shared for p in plans)
+
+
+def test_strategies_are_interned_and_frozen():
+    registry = SchedulingRegistry()
+    ms = registry.intern_strategy(MONTHLY_HEAD, MONTHLY_PACKAGES)
+    assert registry.intern_strategy(list(MONTHLY_HEAD), [list(p) for p in MONTHLY_PACKAGES]) is ms
+    assert registry.intern_strategy(HOURLY_HEAD, HOURLY_PACKAGES) is not ms
+    with pytest.raises(AttributeError):
+        ms.cycle_change_factor = 2
+    with pytest.raises(TypeError):
+        ms.packages[99] = None
+    with pytest.raises(ValueError):
+        registry.strategy('missing')
+
+
+def test_strategy_plans_share_the_strategy(plan_data):
+    definitions = [{'plan': plan_data(f'10{i}'),
+                    'strategy': {'head': MONTHLY_HEAD, 'packages': MONTHLY_PACKAGES}}
+                   for i in range(3)]
+    schedulers = [build_scheduler(d, MemoryScheduleStore()) for d in definitions]
+    assert len({id(s._plan.strategy) for s in schedulers}) == 1
+
+
+def test_frozen_strategy_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(plan_alg, 'STRATEGY_MEMO_SIZE', 4)
+    ms = SchedulingRegistry().intern_strategy(HOURLY_HEAD, HOURLY_PACKAGES)
+    offsets = [ms.next_offset(0, previous) for previous in range(10)]
+    assert len(ms._memo) <= 4
+    assert [ms.next_offset(0, previous) for previous in range(10)] == offsets
+    assert offsets[0] == 2 and offsets[2] == 3
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from plan_alg import (MaintenancePlan, MemoryScheduleStore, SingleCycleScheduler,
+                      str2Date, ST_MANUAL)
+
+
+def _scheduler(plan_data, **overrides):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(**overrides)), store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20230101'))
+    return s
+
+
+def test_call_index_follows_the_call_list(plan_data):
+    s = _scheduler(plan_data, cycle=14, cycle_unit='D')
+    c = s.calls[2]
+    s.manual_call(c, c.planned_date + timedelta(days=3))
+    s.manual_call(c, c.planned_date + timedelta(days=4))
+    s.update_scheduling()
+    for c in s.calls:
+        assert s.get_call(c.call_num) is c
+    assert s.get_call(12345) is None
+    scheduled = [c for c in s.calls if c.scheduling_type != ST_MANUAL]
+    manual = [c for c in s.calls if c.scheduling_type == ST_MANUAL]
+    assert s.get_last_scheduled_call() is max(scheduled, key=lambda c: c.call_num)
+    assert s.get_next_manual_call_num() == max(c.call_num for c in manual) + 1
+    assert [c.call_num for c in manual] == [90000000, 90000001]
+
+
+def test_call_index_of_a_reloaded_schedule(plan_data):
+    store = MemoryScheduleStore()
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(cycle=10, cycle_unit='D')), store=store)
+    s.start_scheduling(str2Date('20230101'))
+    s.save_to_DB()
+    loaded = SingleCycleScheduler(MaintenancePlan(plan_data(cycle=10, cycle_unit='D')),
+                                  store=store)
+    assert loaded.get_call_list() == s.get_call_list()
+    for c in loaded.calls[1:]:
+        assert c.prev_call is loaded.get_call(c.prev_call_num)
+    assert loaded.get_next_manual_call_num() == 90000000
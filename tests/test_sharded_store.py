@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import plan_alg
+from plan_alg import FileLock, ShardedJsonScheduleStore
+from test_store import ROWS
+
+
+def _save_plans(directory, plan_nums):
+    store = ShardedJsonScheduleStore(directory, shards=2)
+    for num in plan_nums:
+        store.apply_delta(num, ROWS, [])
+
+
+def test_only_the_shards_of_saved_plans_are_written(tmp_path, monkeypatch):
+    store = ShardedJsonScheduleStore(str(tmp_path / 'MHIS'), shards=8)
+    plans = {f'P{i}': ROWS[:1 + i % 2] for i in range(40)}
+    store.save_plans(plans)
+    assert store.load_plans(list(plans)) == plans
+    assert sorted(store.plan_nums()) == sorted(plans)
+
+    written = []
+    write = ShardedJsonScheduleStore._write_shard
+    monkeypatch.setattr(ShardedJsonScheduleStore, '_write_shard',
+                        lambda self, shard, data: (written.append(shard), write(self, shard, data)))
+    store.apply_delta('P3', [], [1])
+    store.save_plans({'P5': ROWS, 'P6': ROWS})
+    assert written[0] == store._shard('P3')
+    assert sorted(written[1:]) == sorted({store._shard('P5'), store._shard('P6')})
+    assert store.load_plan('P3') == ROWS[1:]
+
+
+def test_failed_write_keeps_the_shard(tmp_path, monkeypatch):
+    store = ShardedJsonScheduleStore(str(tmp_path / 'MHIS'), shards=1)
+    store.save_plans({'P1': ROWS})
+
+    def failing_dump(data, f):
+        f.write('{"P1": [')
+        raise OSError('disk full')
+    monkeypatch.setattr(plan_alg.json, 'dump', failing_dump)
+    with pytest.raises(OSError):
+        store.save_plans({'P1': ROWS[:1]})
+    monkeypatch.undo()
+    assert store.load_plan('P1') == ROWS
+    assert [f for f in os.listdir(store.directory) if f.endswith('.tmp')] == []
+
+
+def test_processes_saving_into_one_shard_keep_all_plans(tmp_path):
+    directory = str(tmp_path / 'MHIS')
+    groups = [[f'W{w}P{i}' for i in range(15)] for w in range(4)]
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        list(pool.map(_save_plans, [directory] * len(groups), groups))
+    store = ShardedJsonScheduleStore(directory, shards=2)
+    assert sorted(store.plan_nums()) == sorted(num for g in groups for num in g)
+    assert all(rows == ROWS for rows in store.load_plans(store.plan_nums()).values())
+
+
+def _shard_lock(directory, plan_num):
+    store = ShardedJsonScheduleStore(directory, shards=2)
+    os.makedirs(directory, exist_ok=True)
+    return store._shard_file(store._shard(plan_num)) + '.lock'
+
+
+def test_two_holders_of_a_shard_lock_serialize(tmp_path):
+    lock_file = _shard_lock(str(tmp_path / 'MHIS'), 'P1')
+    spans = []
+
+    def hold():
+        with FileLock(lock_file, timeout=5):
+            entered = time.monotonic()
+            time.sleep(0.05)
+            spans.append((entered, time.monotonic()))
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    first, second = sorted(spans)
+    assert first[1] <= second[0]
+
+
+def test_shard_lock_times_out_while_held(tmp_path):
+    lock_file = _shard_lock(str(tmp_path / 'MHIS'), 'P1')
+    with FileLock(lock_file):
+        started = time.monotonic()
+        with pytest.raises(TimeoutError, match='not acquired'):
+            with FileLock(lock_file, timeout=0.2):
+                pass
+        assert time.monotonic() - started >= 0.2
+    with FileLock(lock_file, timeout=0.2):
+        pass
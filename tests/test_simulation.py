@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+import numpy
+import pytest
+
+from plan_alg import DelayDistribution, simulate_plans, str2Date, SI_FACTORY_CALENDAR
+
+
+def _plans(plan_data, n=3, **overrides):
+    return [plan_data(f'10{i}', cycle=30 + 7 * i, cycle_unit='D', start_date='20230101',
+                      **overrides) for i in range(n)]
+
+
+def _nominal_calls(first, step, end):
+    return (end - first).days // step + 1
+
+
+def test_without_delays_every_run_follows_the_plan(plan_data):
+    plans = _plans(plan_data)
+    result = simulate_plans(plans, DelayDistribution('empirical', values=[0]), years=2,
+                            runs=50, workers=1)
+    start, end = str2Date('20230101'), str2Date('20250101')
+    for i, pp in enumerate(plans):
+        step = pp['cycle']
+        assert list(result.drift[i]) == [0, 0, 0]
+        assert list(result.calls[i]) == [_nominal_calls(start + timedelta(days=step), step, end)] * 3
+        assert result.calls_per_year[i].sum(axis=0).tolist() == list(result.calls[i])
+
+
+def test_late_completions_shift_the_following_calls(plan_data):
+    plans = _plans(plan_data, n=1, SF_late_tolerance=10)
+    result = simulate_plans(plans, DelayDistribution('empirical', values=[9]), years=2,
+                            runs=20, workers=1)
+    start, end = str2Date('20230101'), str2Date('20250101')
+    # 9 days late exceeds the 3 day tolerance, every call moves 9 days
+    assert list(result.calls[0]) == [_nominal_calls(start + timedelta(days=30), 39, end)] * 3
+    assert result.drift[0][1] > 0
+
+
+def test_results_are_reproducible_across_workers(plan_data):
+    plans = _plans(plan_data, n=4)
+    delays = DelayDistribution('normal', mean=2, std=6)
+    one = simulate_plans(plans, delays, years=3, runs=200, seed=7, workers=1)
+    two = simulate_plans(plans, delays, years=3, runs=200, seed=7, workers=2)
+    assert numpy.array_equal(one.drift, two.drift)
+    assert numpy.array_equal(one.calls_per_year, two.calls_per_year)
+    other = simulate_plans(plans, delays, years=3, runs=200, seed=8, workers=1)
+    assert not numpy.array_equal(one.drift, other.drift)
+    df = one.to_dataframe()
+    assert len(df) == 4 * 3 and 'calls_year_3' in df.columns
+
+
+def test_overrides_and_unsupported_plans(plan_data):
+    plans = _plans(plan_data, n=1)
+    delays = DelayDistribution('uniform', low=10, high=20)
+    shifted = simulate_plans(plans, delays, years=2, runs=50, workers=1)
+    kept = simulate_plans(plans, delays, years=2, runs=50, workers=1,
+                          overrides={'SF_late': 0})
+    assert list(kept.drift[0]) == [0, 0, 0] and shifted.drift[0][0] > 0
+    with pytest.raises(ValueError):
+        simulate_plans(_plans(plan_data, n=1, scheduling_indicator=SI_FACTORY_CALENDAR),
+                       delays, workers=1)
+    with pytest.raises(ValueError):
+        DelayDistribution('poisson')
@@ -0,0 +1,47 @@
+from plan_alg import (LocalCallObjectSink, MaintenancePlan, MemoryScheduleStore,
+                      SingleCycleScheduler, str2Date, SS_CALLED, SS_SAVE_TO_CALL)
+
+
+def _scheduler(plan_data, sink):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(cycle=7, cycle_unit='D', call_horizon=100)),
+                             store=MemoryScheduleStore(), sink=sink)
+    s.start_scheduling(str2Date('20230101'))
+    return s
+
+
+def test_sink_creates_call_objects_in_batches(plan_data):
+    sink = LocalCallObjectSink(batch_size=4, workers=2)
+    s = _scheduler(plan_data, sink)
+    pending = [c.call_num for c in s.calls if c.status == SS_SAVE_TO_CALL]
+    assert len(pending) > 8
+    assert s.create_call_objects() == {}
+    assert sorted(n for _, n in sink.created) == pending
+    assert sink.batches == -(-len(pending) // 4)
+    assert all(s.get_call(n).status == SS_CALLED for n in pending)
+    assert set(pending) <= set(s._changed)
+    sink.close()
+
+
+def test_failed_batches_are_retried_and_reported(plan_data, capsys):
+    sink = LocalCallObjectSink(batch_size=100, retries=1, failures=2)
+    s = _scheduler(plan_data, sink)
+    pending = [c.call_num for c in s.calls if c.status == SS_SAVE_TO_CALL]
+    errors = s.create_call_objects()
+    assert errors == {n: 'ConnectionError: simulated downstream failure' for n in pending}
+    assert capsys.readouterr().out == ''
+    assert all(s.get_call(n).status == SS_SAVE_TO_CALL for n in pending)
+    assert s.create_call_objects() == {}  # the sink works again
+    assert all(s.get_call(n).status == SS_CALLED for n in pending)
+    sink.close()
+
+
+def test_sink_shares_one_executor(plan_data):
+    sink = LocalCallObjectSink(batch_size=1, workers=3)
+    pools = set()
+    for i in range(3):
+        s = _scheduler(plan_data, sink)
+        s.create_call_objects()
+        pools.add(id(sink._pool))
+    assert len(pools) == 1
+    sink.close()
+    assert sink._pool is None
@@ -0,0 +1,38 @@
+import pytest
+
+from plan_alg import (JsonScheduleStore, MemoryScheduleStore, SqliteScheduleStore,
+                      MaintenancePlan, SingleCycleScheduler, str2Date)
+
+ROWS = [[1, '20230701', '20230615', '', '20230601', '', 0, 'T', 'Hold', ''],
+        [2, '20230801', '20230715', '20230802', '20230601', '20230701', 1, 'T', 'Completed',
+         '2M']]
+
+
+@pytest.fixture(params=['json', 'sqlite', 'memory'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        yield JsonScheduleStore(str(tmp_path / 'MHIS.json'))
+    elif request.param == 'sqlite':
+        s = SqliteScheduleStore(str(tmp_path / 'MHIS.db'))
+        yield s
+        s.close()
+    else:
+        yield MemoryScheduleStore()
+
+
+def test_store_round_trip(store):
+    assert store.load_plan('P1') == []
+    store.save_plans({'P1': ROWS, 'P2': ROWS[:1]})
+    assert store.load_plan('P1') == ROWS
+    assert store.load_plans(['P2', 'P3']) == {'P2': ROWS[:1], 'P3': []}
+    store.save_plan('P1', ROWS[1:])  # a save replaces the rows of the plan
+    assert store.load_plan('P1') == ROWS[1:]
+    assert sorted(store.plan_nums()) == ['P1', 'P2']
+
+
+def test_scheduler_saves_to_its_store(store, plan_data):
+    s = SingleCycleScheduler(MaintenancePlan(plan_data()), store=store)
+    s.start_scheduling(str2Date('20230101'))
+    s.save_to_DB()
+    loaded = SingleCycleScheduler(MaintenancePlan(plan_data()), store=store)
+    assert loaded.get_call_list() == s.get_call_list()
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import pytest
+
+from plan_alg import MaintenanceStrategy, str2Date
+
+MONTHLY_HEAD = ["A", "Scheduling by time", 0, "MON", 0, 0, 0, 0, 0, ""]
+MONTHLY_PACKAGES = [
+    [1, 2, "MON", "2-monthly", "2M", 1, "H1", 0, "", 2, 2, True],
+    [2, 3, "MON", "3-monthly", "3M", 2, "H2", 0, "", 5, 5, True],
+    [3, 5, "MON", "5-monthly", "5M", 3, "H3", 0, "", 10, 10, True]]
+HOURLY_HEAD = ["B", "hours", 0, "H", 0, 0, 0, 0, 0, ""]
+HOURLY_PACKAGES = [
+    [1, 36, "H", "36H", "36H", 1, "H1", 0, "", 0, 0, True],
+    [2, 48, "H", "48H", "48H", 2, "H2", 0, "", 0, 0, True]]
+
+
+# the day by day scans of the original MaintenanceStrategy
+def _package_sequence(ms, start_offset=0, period=360):
+    ps = []
+    for i in range(start_offset + 1, int(start_offset + period + 1)):
+        due = [p.number for p in ms.packages.values() if i % p.cycle_in_days() == 0]
+        if due:
+            ps.append((i, due))
+    return ps
+
+
+def _next_offset(ms, start_offset=0, previous_offset=0):
+    ps = _package_sequence(ms, start_offset, previous_offset + ms.max_cycle_in_days())
+    result = ps[0][0]
+    for i in range(len(ps)):
+        if ps[i][0] == previous_offset:
+            result = ps[i + 1][0]
+            break
+    return result
+
+
+def _due_packages_text(ms, d, start_date, previous_offset=0):
+    delta = (d - start_date).days
+    for offset, due in _package_sequence(ms, previous_offset):
+        if previous_offset + delta >= offset:
+            return ''.join(ms.packages[i].cycle_short_text for i in due)
+    return ''
+
+
+def test_package_sequence_and_offsets_match_scan():
+    ms = MaintenanceStrategy(MONTHLY_HEAD, MONTHLY_PACKAGES)
+    for start in (0, 30, 45, 300):
+        assert ms.package_sequence(start, 720) == _package_sequence(ms, start, 720)
+    for previous in [0] + [o for o, _ in _package_sequence(ms, 0, 900)]:
+        assert ms.next_offset(0, previous) == _next_offset(ms, 0, previous)
+
+
+def test_due_packages_text_matches_scan():
+    ms = MaintenanceStrategy(MONTHLY_HEAD, MONTHLY_PACKAGES)
+    start = str2Date('20230101')
+    for days in range(0, 400, 11):
+        for previous in (0, 60, 90):
+            d = start + timedelta(days=days)
+            assert ms.due_packages_text(d, start, previous) == \
+                _due_packages_text(ms, d, start, previous)
+
+
+def test_fractional_cycles_use_the_scan():
+    ms = MaintenanceStrategy(HOURLY_HEAD, HOURLY_PACKAGES)
+    assert ms.min_cycle_in_days() == pytest.approx(1.5)
+    assert ms.max_cycle_in_days() == pytest.approx(2.0)
+    assert ms.next_offset(0, 0) == 2
+    assert ms.next_offset(0, 2) == 3
@@ -0,0 +1,58 @@
+import collections
+import random
+from datetime import timedelta
+
+from plan_alg import (DayCounter, MaintenancePlan, MemoryScheduleStore, SingleCycleScheduler,
+                      WorkloadIndex, str2Date, SS_CALLED)
+
+
+def test_day_counter_matches_brute_force_while_growing():
+    rng = random.Random(4)
+    counter = DayCounter()
+    counts = collections.Counter()
+    base = str2Date('20230601').toordinal()
+    for step in range(2000):
+        o = base + int(rng.gauss(0, 40 * (1 + step // 500)))
+        n = rng.choice([1, 1, 2, -1]) if counts[o] > 0 else 1
+        counter.add(o, n)
+        counts[o] += n
+        if step % 97 == 0:
+            for q in (min(counts) - 1, base, max(counts) + 1, base + rng.randint(-500, 500)):
+                assert counter.count_before(q) == sum(v for k, v in counts.items() if k < q)
+    assert len(counter) < 4 * (max(counts) - min(counts) + 1)
+
+
+def test_day_counters_are_sized_to_the_dates_in_use(plan_data):
+    index = WorkloadIndex()
+    for i in range(20):
+        s = SingleCycleScheduler(MaintenancePlan(plan_data(f'10{i}', cycle=7, cycle_unit='D',
+                                                           work_center=f'WC{i % 4}')),
+                                 store=MemoryScheduleStore())
+        s.start_scheduling(str2Date('20230601'))
+        index.watch(s)
+    assert len(index._counters) == 2 * 5
+    assert all(len(counter) <= 1024 for counter in index._counters.values())
+    start = str2Date('20230601')
+    assert index.count(start, start + timedelta(days=400)) == \
+        sum(index.count(start, start + timedelta(days=400), work_center=f'WC{i}')
+            for i in range(4))
+
+
+def test_workload_follows_scheduler_changes(plan_data):
+    index = WorkloadIndex()
+    s = SingleCycleScheduler(MaintenancePlan(plan_data(cycle=30, cycle_unit='D',
+                                                       call_horizon=100)),
+                             store=MemoryScheduleStore())
+    s.start_scheduling(str2Date('20230101'))
+    index.watch(s)
+    start, end = str2Date('19000102'), str2Date('21991231')
+    total = index.count(start, end)
+    c = s.calls[0]
+    s.create_call_objects()
+    assert c.status == SS_CALLED
+    s.complete_call(c, c.planned_date)
+    s.update_scheduling()
+    assert index.count(start, end) == sum(1 for c in s.calls if c.status in index.open_statuses)
+    assert index.count(start, end) != 0 and total != 0
+    weeks = index.histogram(str2Date('20230101'), str2Date('20231231'))
+    assert sum(n for _, n in weeks) == index.count(str2Date('20230101'), str2Date('20231231'))